@@ -513,3 +513,115 @@ To test with local API:
    - Physical device: "http://YOUR_IP_ADDRESS:8000/"
 4. Ensure your phone and computer are on the same WiFi network
 */
+
+// ============================================================================
+// 11. On-Device Prediction (no network round-trip)
+// ============================================================================
+
+/*
+Export the model and bundle it with the app:
+
+1. python edge_export.py             -> writes sleep_model_edge.json (~2 KB)
+2. Copy it to app/src/main/assets/sleep_model_edge.json
+3. Re-export and ship an app update whenever the model is retrained
+
+The file format is documented in edge_export.py; this evaluator mirrors its
+Python reference implementation (EdgeModel). Only org.json from the Android
+SDK is needed.
+*/
+
+package com.example.sleepapp.data.local
+
+import android.content.Context
+import com.example.sleepapp.data.model.PredictionRequest
+import com.example.sleepapp.data.model.PredictionResponse
+import org.json.JSONArray
+import org.json.JSONObject
+
+class OnDeviceSleepModel(json: JSONObject) {
+    
+    private val fields = json.getJSONArray("fields").toStringList()
+    private val scales = json.getJSONArray("scales").toIntArray()
+    private val labels = json.getJSONArray("labels").toStringList()
+    private val left = json.getJSONArray("left").toIntArray()
+    private val right = json.getJSONArray("right").toIntArray()
+    private val feature = json.getJSONArray("feature").toIntArray()
+    private val threshold = json.getJSONArray("threshold").toLongArray()
+    private val label = json.getJSONArray("label").toIntArray()
+    private val confidence = json.getJSONArray("confidence").toIntArray()
+    
+    // Categorical field -> (value -> code)
+    private val categories: Map<String, Map<String, Int>> = json.getJSONObject("categories").let { obj ->
+        obj.keys().asSequence().associateWith { key ->
+            obj.getJSONArray(key).toStringList().withIndex().associate { (code, value) -> value to code }
+        }
+    }
+    
+    init {
+        require(json.getString("format") == "sleep-disorder-tree/2") { "Unsupported model format" }
+    }
+    
+    companion object {
+        fun fromAsset(context: Context, name: String = "sleep_model_edge.json"): OnDeviceSleepModel {
+            val text = context.assets.open(name).bufferedReader().use { it.readText() }
+            return OnDeviceSleepModel(JSONObject(text))
+        }
+    }
+    
+    // Returns null if a categorical value is unknown to the model
+    fun predict(request: PredictionRequest): PredictionResponse? {
+        val values = mapOf(
+            "gender" to request.gender,
+            "age" to request.age,
+            "occupation" to request.occupation,
+            "sleep_duration" to request.sleepDuration,
+            "quality_of_sleep" to request.qualityOfSleep,
+            "physical_activity_level" to request.physicalActivityLevel,
+            "stress_level" to request.stressLevel,
+            "bmi_category" to request.bmiCategory,
+            "heart_rate" to request.heartRate,
+            "daily_steps" to request.dailySteps,
+            "systolic_bp" to request.systolicBp,
+            "diastolic_bp" to request.diastolicBp
+        )
+        val row = DoubleArray(fields.size)
+        for ((i, field) in fields.withIndex()) {
+            val value = values.getValue(field)
+            row[i] = if (value is String) {
+                categories[field]?.get(value)?.toDouble() ?: return null
+            } else {
+                (value as Number).toDouble()
+            }
+        }
+        
+        var node = 0
+        while (left[node] != -1) {
+            val f = feature[node]
+            // Strict "<" against the cut point, divided in double precision like EdgeModel
+            node = if (row[f] < threshold[node].toDouble() / scales[f]) left[node] else right[node]
+        }
+        
+        val predicted = labels[label[node]]
+        val message = if (predicted == "None") {
+            "No sleep disorder detected. Maintain healthy lifestyle habits!"
+        } else {
+            "Potential sleep disorder detected: $predicted. Consider consulting a healthcare professional."
+        }
+        return PredictionResponse(predicted, confidence[node] / 100.0, message)
+    }
+    
+    private fun JSONArray.toStringList() = List(length()) { getString(it) }
+    private fun JSONArray.toIntArray() = IntArray(length()) { getInt(it) }
+    private fun JSONArray.toLongArray() = LongArray(length()) { getLong(it) }
+}
+
+/*
+Usage in SleepDisorderRepository - predict locally, fall back to the API:
+
+    private val localModel by lazy { OnDeviceSleepModel.fromAsset(appContext) }
+    
+    suspend fun predictSleepDisorder(request: PredictionRequest): PredictionResponse? {
+        localModel.predict(request)?.let { return it }
+        return api.predict(request).body()
+    }
+*/
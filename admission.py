@@ -0,0 +1,221 @@
+"""
+Admission control for the prediction endpoints.
+
+Each traffic class (single predictions, batches) gets its own limiter: a
+fixed number of requests run at once, a bounded number wait, and a waiting
+request gives up after a deadline. Rejected requests get 429 (queue full) or
+503 (waited too long) with a Retry-After hint, so the server sheds load
+quickly instead of letting latency grow until the health check fails.
+Request bodies are capped per route by BodySizeLimit.
+"""
+import asyncio
+import json
+import math
+import os
+from collections import deque
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted"""
+
+    def __init__(self, status_code, detail, retry_after):
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+        super().__init__(detail)
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded FIFO wait queue and a queue-wait deadline"""
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        # Moving average of request service time, used for Retry-After
+        self._service_time = 0.05
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up for a new request"""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._service_time * backlog / self.max_concurrent))
+
+    async def acquire(self):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise Overloaded(429, f"Too many {self.name} requests queued", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot directly to the waiter
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.rejected_timeout += 1
+            raise Overloaded(503, f"Server busy: {self.name} request waited too long", self.retry_after())
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot we were already handed
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        self.admitted += 1
+
+    def _discard(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, service_time=None):
+        if service_time is not None:
+            self._service_time = 0.9 * self._service_time + 0.1 * service_time
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_service_seconds": round(self._service_time, 4),
+        }
+
+
+class AdmissionConfig:
+    """Limits for each traffic class, read from ADMISSION_* environment variables"""
+
+    def __init__(self):
+        self.single = AdmissionLimiter(
+            "single",
+            max_concurrent=int(os.getenv("ADMISSION_SINGLE_CONCURRENCY", "32")),
+            max_queue=int(os.getenv("ADMISSION_SINGLE_QUEUE", "256")),
+            queue_timeout=float(os.getenv("ADMISSION_SINGLE_QUEUE_TIMEOUT", "1.0")),
+        )
+        self.batch = AdmissionLimiter(
+            "batch",
+            max_concurrent=int(os.getenv("ADMISSION_BATCH_CONCURRENCY", "4")),
+            max_queue=int(os.getenv("ADMISSION_BATCH_QUEUE", "16")),
+            queue_timeout=float(os.getenv("ADMISSION_BATCH_QUEUE_TIMEOUT", "5.0")),
+        )
+        self.max_single_body_bytes = int(os.getenv("ADMISSION_MAX_BODY_BYTES", str(64 * 1024)))
+        self.max_batch_body_bytes = int(os.getenv("ADMISSION_MAX_BATCH_BODY_BYTES", str(10 * 1024 * 1024)))
+        # JSON jobs are parsed in memory, so they get the batch limit; larger inputs go through /api/jobs/file
+        self.max_job_json_body_bytes = int(os.getenv("ADMISSION_MAX_JOB_JSON_BODY_BYTES", str(self.max_batch_body_bytes)))
+        self.max_job_body_bytes = int(os.getenv("ADMISSION_MAX_JOB_BODY_BYTES", str(1024 * 1024 * 1024)))
+        self.max_batch_size = int(os.getenv("ADMISSION_MAX_BATCH_SIZE", "1000"))
+        self.rejected_body_too_large = 0
+
+    def route(self, method, path):
+        """(limiter, max body bytes) for a request, or (None, None) if it is not limited"""
+        if method != "POST":
+            return None, None
+        if path == "/api/predict":
+            return self.single, self.max_single_body_bytes
+        if path == "/api/predict/batch":
+            return self.batch, self.max_batch_body_bytes
+        if path == "/api/jobs":
+            return self.batch, self.max_job_json_body_bytes
+        if path.startswith("/api/jobs"):
+            return self.batch, self.max_job_body_bytes
+        return None, None
+
+    def stats(self):
+        return {
+            "single": self.single.stats(),
+            "batch": self.batch.stats(),
+            "max_batch_size": self.max_batch_size,
+            "rejected_body_too_large": self.rejected_body_too_large,
+        }
+
+
+class BodySizeLimit:
+    """
+    ASGI middleware enforcing AdmissionConfig's per-route request body limits
+
+    Content-Length is checked before the request reaches the app. Bytes are
+    also counted as the app reads them, so a chunked body without a
+    Content-Length is cut off with the same 413 once it passes the limit.
+    """
+
+    def __init__(self, app, config):
+        self.app = app
+        self.config = config
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limiter, max_body_bytes = self.config.route(scope["method"], scope["path"])
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > max_body_bytes:
+            self.config.rejected_body_too_large += 1
+            return await self._reject(send, max_body_bytes)
+
+        received = 0
+        response_started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and not response_started:
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    rejected = True
+                    self.config.rejected_body_too_large += 1
+                    await self._reject(send, max_body_bytes)
+                    # The app sees the client go away and stops reading
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # Errors from the app abandoning the body we cut off
+            if not rejected:
+                raise
+
+    @staticmethod
+    async def _reject(send, max_body_bytes):
+        body = json.dumps({"detail": f"Request body too large (limit {max_body_bytes} bytes)"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,14 +1,30 @@
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Request, Query, UploadFile, File, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field, validator, ValidationError
-import joblib
-import pandas as pd
-import numpy as np
 from typing import Optional
 import os
 import json
+import numpy as np
+import pandas as pd
+import time
+import hashlib
+import hmac
+import asyncio
+import random
+import math
+
+from prediction_log import logger_from_env
+from drift import monitor_from_env
+from inference import load_service, UnknownCategoryError, REQUEST_FIELDS, FIELD_RANGES, CATEGORY_ALIASES
+from jobs import count_rows, runner_from_env
+import process_stats
+from admission import AdmissionConfig, BodySizeLimit, Overloaded
+import profiling
+from profiling import span
+from usage import tracker_from_env, Caller
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -20,85 +36,269 @@ app = FastAPI(
 # Enable CORS for Android app
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify your Android app's domain
+    allow_origins=os.getenv("CORS_ORIGINS", "*").split(","),  # In production, specify your Android app's domain
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Admission control: separate concurrency/queue budgets for single and batch traffic
+admission = AdmissionConfig()
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    limiter, _ = admission.route(request.method, request.url.path)
+    if limiter is None:
+        return await call_next(request)
+    
+    try:
+        with span("queue"):
+            await limiter.acquire()
+    except Overloaded as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.detail},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    started = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        limiter.release(time.perf_counter() - started)
+
+# Request tracing: per-request spans, returned as a Server-Timing header when the
+# client sends X-Server-Timing, and exported when TRACE_EXPORTER is configured
+trace_exporter = None
+trace_sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+# Registered after admission_control so it wraps it and sees queueing time too
+@app.middleware("http")
+async def request_tracing(request: Request, call_next):
+    wants_timing = "x-server-timing" in request.headers
+    exported = trace_exporter is not None and random.random() < trace_sample_rate
+    if not (wants_timing or exported):
+        return await call_next(request)
+    
+    trace, token = profiling.start_trace(f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+        # Response model validation and JSON encoding run after the endpoint's last span,
+        # unless the endpoint renders its own response
+        if trace.spans and trace.spans[-1][0] != "serialize":
+            name, start, duration = trace.spans[-1]
+            profiling.add_span("serialize", start + duration, time.perf_counter())
+    finally:
+        profiling.end_trace(trace, token)
+    if wants_timing:
+        response.headers["Server-Timing"] = trace.server_timing()
+    if exported:
+        try:
+            trace_exporter.export(trace)
+        except Exception as e:
+            print(f"❌ Error exporting trace: {str(e)}")
+    return response
+
+# Body size limits, added last so they run first: oversized requests are
+# rejected before queueing, and chunked bodies are counted as they arrive
+app.add_middleware(BodySizeLimit, config=admission)
+
 # Custom validation error handler
+MAX_REPORTED_ERRORS = 50
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    errors = []
-    for error in exc.errors():
-        field = " -> ".join(str(x) for x in error["loc"])
-        message = error["msg"]
-        error_type = error["type"]
-        
+    # Only the first few errors are formatted; a large invalid body can produce thousands
+    all_errors = exc.errors()
+    errors = [
         # Make error messages more user-friendly
-        if "value_error" in error_type:
-            errors.append(f"{field}: {message}")
-        else:
-            errors.append(f"{field}: {message} (type: {error_type})")
+        f"{' -> '.join(map(str, error['loc']))}: {error['msg']}"
+        + ("" if "value_error" in error["type"] else f" (type: {error['type']})")
+        for error in all_errors[:MAX_REPORTED_ERRORS]
+    ]
     
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={
             "detail": "Validation Error",
             "errors": errors,
+            "error_count": len(all_errors),
             "tip": "Check the /api/options endpoint to see valid values for categorical fields"
         }
     )
 
 # Global variable to store model data
 model_data = None
+model_version = None
 
-# Load model on startup
-@app.on_event("startup")
-async def load_model():
-    global model_data
+# Shared encoding tables, prediction cache and tree evaluator (see inference.py)
+inference_service = None
+
+# Background scoring jobs for very large batches (see jobs.py)
+job_runner = None
+
+# Per-leaf explanation responses, built once at model load
+explanation_templates = {}
+
+# Background prediction log (see prediction_log.py)
+prediction_logger = None
+
+# Rolling feature drift statistics (see drift.py)
+drift_monitor = None
+
+# Per-API-key rate limits and usage accounting (see usage.py); None unless API_KEYS is set
+usage_tracker = None
+
+def artifact_version(path):
+    """Short content hash of the model artifact, recorded with every logged prediction"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+def build_explanation_templates():
+    """Precompute the explanation returned for every leaf of the loaded tree"""
+    explanation_templates.clear()
+    for leaf, explanation in inference_service.leaf_explanations.items():
+        explanation_templates[leaf] = PredictionExplanation(
+            decision_path=explanation.decision_path,
+            top_features=[
+                FeatureContribution(feature=feature, contribution=round(contribution, 2))
+                for feature, contribution in explanation.top_features
+            ]
+        )
+
+def load_model_data(model_path='sleepdisordermodel.pkl'):
+    """
+    Load the model artifact into the module globals
+    
+    Under gunicorn with preload_app (see gunicorn.conf.py) this runs once in
+    the master before workers fork, so all workers share the loaded model.
+    """
+    global model_data, model_version, inference_service
     try:
-        model_path = 'sleepdisordermodel.pkl'
         if os.path.exists(model_path):
-            model_data = joblib.load(model_path)
+            inference_service = load_service(model_path)
+            model_data = inference_service.model_data
+            build_explanation_templates()
+            model_version = model_data.get('version') or artifact_version(model_path)
             print("✅ Model loaded successfully!")
         else:
             print("⚠️ Warning: Model file not found. Please train and save the model first.")
     except Exception as e:
         print(f"❌ Error loading model: {str(e)}")
 
+# Load model on startup
+@app.on_event("startup")
+async def load_model():
+    # Already loaded if the gunicorn master preloaded it before forking
+    if model_data is None:
+        load_model_data()
+
+@app.on_event("startup")
+async def start_prediction_log():
+    global prediction_logger
+    try:
+        prediction_logger = logger_from_env()
+        if prediction_logger is not None:
+            prediction_logger.start()
+    except Exception as e:
+        prediction_logger = None
+        print(f"❌ Error starting prediction log: {str(e)}")
+
+@app.on_event("startup")
+async def start_drift_monitor():
+    global drift_monitor
+    try:
+        drift_monitor = monitor_from_env()
+    except Exception as e:
+        drift_monitor = None
+        print(f"❌ Error starting drift monitor: {str(e)}")
+
+@app.on_event("startup")
+async def start_job_runner():
+    global job_runner
+    try:
+        job_runner = runner_from_env(lambda: inference_service, record_job_rows)
+        if job_runner is not None:
+            job_runner.start()
+    except Exception as e:
+        job_runner = None
+        print(f"❌ Error starting job runner: {str(e)}")
+
+@app.on_event("startup")
+async def report_process_ready():
+    process_stats.mark_ready()
+    stats = process_stats.snapshot()
+    print(f"✅ Worker {stats['pid']} ready in {stats['startup_seconds']}s, memory: {stats['memory']}")
+
+@app.on_event("startup")
+async def start_tracing():
+    global trace_exporter
+    try:
+        trace_exporter = profiling.exporter_from_env()
+    except Exception as e:
+        trace_exporter = None
+        print(f"❌ Error starting trace exporter: {str(e)}")
+
+@app.on_event("startup")
+async def start_usage_tracking():
+    global usage_tracker
+    try:
+        usage_tracker = tracker_from_env()
+        if usage_tracker is not None:
+            usage_tracker.start()
+    except Exception as e:
+        usage_tracker = None
+        print(f"❌ Error starting usage tracking: {str(e)}")
+
+@app.on_event("shutdown")
+async def stop_usage_tracking():
+    if usage_tracker is not None:
+        usage_tracker.stop()
+
+@app.on_event("shutdown")
+async def stop_tracing():
+    if trace_exporter is not None:
+        trace_exporter.close()
+
+@app.on_event("shutdown")
+async def stop_job_runner():
+    if job_runner is not None:
+        job_runner.stop()
+
+@app.on_event("shutdown")
+async def stop_prediction_log():
+    if prediction_logger is not None:
+        prediction_logger.stop()
+
 # Request model for prediction
 class PredictionRequest(BaseModel):
     gender: str = Field(..., description="Gender: Male or Female")
-    age: int = Field(..., ge=10, le=100, description="Age between 10 and 100")
+    age: int = Field(..., ge=FIELD_RANGES["age"][0], le=FIELD_RANGES["age"][1], description="Age between 10 and 100")
     occupation: str = Field(..., description="Occupation type")
-    sleep_duration: float = Field(..., ge=0, le=12, description="Sleep duration in hours")
-    quality_of_sleep: int = Field(..., ge=1, le=10, description="Quality of sleep rating (1-10)")
-    physical_activity_level: int = Field(..., ge=1, le=10, description="Physical activity level (1-10)")
-    stress_level: int = Field(..., ge=1, le=10, description="Stress level (1-10)")
+    sleep_duration: float = Field(..., ge=FIELD_RANGES["sleep_duration"][0], le=FIELD_RANGES["sleep_duration"][1], description="Sleep duration in hours")
+    quality_of_sleep: int = Field(..., ge=FIELD_RANGES["quality_of_sleep"][0], le=FIELD_RANGES["quality_of_sleep"][1], description="Quality of sleep rating (1-10)")
+    physical_activity_level: int = Field(..., ge=FIELD_RANGES["physical_activity_level"][0], le=FIELD_RANGES["physical_activity_level"][1], description="Physical activity level (1-10)")
+    stress_level: int = Field(..., ge=FIELD_RANGES["stress_level"][0], le=FIELD_RANGES["stress_level"][1], description="Stress level (1-10)")
     bmi_category: str = Field(..., description="BMI Category: Normal, Overweight, Obese, etc.")
-    heart_rate: int = Field(..., ge=40, le=150, description="Heart rate in bpm")
-    daily_steps: int = Field(..., ge=0, le=50000, description="Daily steps count")
-    systolic_bp: int = Field(..., ge=90, le=200, description="Systolic blood pressure")
-    diastolic_bp: int = Field(..., ge=60, le=130, description="Diastolic blood pressure")
+    heart_rate: int = Field(..., ge=FIELD_RANGES["heart_rate"][0], le=FIELD_RANGES["heart_rate"][1], description="Heart rate in bpm")
+    daily_steps: int = Field(..., ge=FIELD_RANGES["daily_steps"][0], le=FIELD_RANGES["daily_steps"][1], description="Daily steps count")
+    systolic_bp: int = Field(..., ge=FIELD_RANGES["systolic_bp"][0], le=FIELD_RANGES["systolic_bp"][1], description="Systolic blood pressure")
+    diastolic_bp: int = Field(..., ge=FIELD_RANGES["diastolic_bp"][0], le=FIELD_RANGES["diastolic_bp"][1], description="Diastolic blood pressure")
 
     @validator('gender')
     def validate_gender(cls, v):
         # Accept case-insensitive and handle common variations
-        if v.lower() not in ['male', 'female', 'm', 'f']:
+        if v.lower() not in CATEGORY_ALIASES['gender']:
             raise ValueError('Gender must be either Male or Female')
         # Normalize to title case
-        return 'Male' if v.lower() in ['male', 'm'] else 'Female'
+        return CATEGORY_ALIASES['gender'][v.lower()]
 
     @validator('bmi_category')
     def validate_bmi_category(cls, v):
-        # Accept case-insensitive and handle variations
-        valid_map = {
-            'normal': 'Normal',
-            'normal weight': 'Normal Weight',
-            'overweight': 'Overweight',
-            'obese': 'Obese'
-        }
+        # Accept case-insensitive and handle variations (shared with batch validation)
+        valid_map = CATEGORY_ALIASES['bmi_category']
         v_lower = v.lower()
         if v_lower not in valid_map:
             raise ValueError(f'BMI Category must be one of: Normal, Normal Weight, Overweight, or Obese')
@@ -122,11 +322,79 @@ class PredictionRequest(BaseModel):
             }
         }
 
+# Explanation models (returned when ?explain=true)
+class FeatureContribution(BaseModel):
+    feature: str
+    contribution: float = Field(..., description="Change in the predicted class probability, in percentage points")
+
+class PredictionExplanation(BaseModel):
+    decision_path: list[str]
+    top_features: list[FeatureContribution]
+
 # Response model
 class PredictionResponse(BaseModel):
     prediction: str
     confidence: Optional[float] = None
     message: str
+    explanation: Optional[PredictionExplanation] = None
+
+# Caller identification and rate limits for partner API keys
+# Async so it runs on the event loop, where the tracker's token buckets live
+async def require_caller(request: Request) -> Optional[Caller]:
+    """Identify the caller by X-API-Key and apply its request rate limit (no-op unless API_KEYS is set)"""
+    if usage_tracker is None:
+        return None
+    tenant = usage_tracker.tenant_for(request.headers.get("x-api-key"))
+    if tenant is None:
+        raise HTTPException(status_code=401, detail="Missing or invalid API key (send it in the X-API-Key header)")
+    caller = Caller(tenant, request.client.host if request.client else "unknown")
+    wait = usage_tracker.admit_request(caller)
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Request rate limit exceeded ({usage_tracker.requests_per_minute} per minute)",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))}
+        )
+    return caller
+
+def require_row_allowance(caller: Optional[Caller], rows: int):
+    """Reserve a batch's rows from the caller's per-minute row allowance"""
+    if caller is None:
+        return
+    wait = usage_tracker.admit_rows(caller, rows)
+    if wait == math.inf:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {rows} rows exceeds your allowance of {usage_tracker.rows_per_minute} rows per minute"
+        )
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Row rate limit exceeded ({usage_tracker.rows_per_minute} rows per minute)",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))}
+        )
+
+def require_job_row_allowance(caller: Optional[Caller], rows: int):
+    """Reserve a job's rows from the caller's daily job row allowance"""
+    if caller is None:
+        return
+    wait = usage_tracker.admit_job_rows(caller, rows)
+    if wait == math.inf:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Job of {rows} rows exceeds your allowance of {usage_tracker.job_rows_per_day} job rows per day"
+        )
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Job row quota exceeded ({usage_tracker.job_rows_per_day} rows per day)",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))}
+        )
+
+def record_job_rows(caller: Caller, rows: int):
+    """Bill rows scored by a job worker to the tenant that submitted the job"""
+    if usage_tracker is not None:
+        usage_tracker.record_rows(caller, rows)
 
 # Health check endpoint
 @app.get("/", tags=["Health"])
@@ -186,9 +454,87 @@ async def get_example_request():
         "curl_command": f'curl -X POST http://localhost:8000/api/predict -H "Content-Type: application/json" -d \'{json.dumps(example)}\''
     }
 
+# Service metrics endpoint
+@app.get("/api/metrics", tags=["Info"])
+async def get_metrics():
+    """
+    Get internal service counters
+    
+    Counters are kept per worker process. Under gunicorn each call is answered by
+    one worker, identified by worker_pid, so the figures cover only that worker's traffic.
+    """
+    return {
+        "worker_pid": os.getpid(),
+        "model_version": model_version,
+        "process": process_stats.snapshot(),
+        "admission": admission.stats(),
+        "inference_cache": inference_service.cache_info() if inference_service is not None else None,
+        "prediction_log": prediction_logger.stats() if prediction_logger is not None else None
+    }
+
+# Usage endpoint
+@app.get("/api/usage", tags=["Info"])
+async def get_usage(
+    client: Optional[str] = Query(None, description="Also estimate rows scored this period for one client address"),
+    caller: Optional[Caller] = Depends(require_caller)
+):
+    """Get the calling API key's tenant usage per period (requests, rows scored, rejections)"""
+    if caller is None:
+        raise HTTPException(status_code=503, detail="Usage accounting is disabled")
+    return await run_in_threadpool(usage_tracker.usage, caller.tenant, 24, client)
+
+# Feature drift endpoint
+@app.get("/api/drift", tags=["Info"])
+async def get_drift():
+    """
+    Get feature drift statistics over the rolling window, compared against the training data
+    
+    Windows are kept per worker process. Under gunicorn each call is answered by one
+    worker, identified by worker_pid, so the statistics cover only that worker's traffic.
+    """
+    if drift_monitor is None:
+        raise HTTPException(status_code=503, detail="Drift monitoring is disabled")
+    return {"worker_pid": os.getpid(), **drift_monitor.stats()}
+
+def request_features(request: PredictionRequest) -> dict:
+    """Map an API request onto the model's feature names"""
+    return {feature: getattr(request, field) for field, feature in REQUEST_FIELDS.items()}
+
+def build_response(result, explain: bool = False) -> PredictionResponse:
+    """Turn an inference result into the API response"""
+    predicted_disorder = result.label
+    
+    # Generate response message
+    if predicted_disorder == "None":
+        message = "No sleep disorder detected. Maintain healthy lifestyle habits!"
+    else:
+        message = f"Potential sleep disorder detected: {predicted_disorder}. Consider consulting a healthcare professional."
+    
+    return PredictionResponse(
+        prediction=predicted_disorder,
+        confidence=round(result.confidence, 2),
+        message=message,
+        explanation=explanation_templates[result.leaf] if explain else None
+    )
+
+def log_prediction(endpoint, input_data, response, started):
+    if prediction_logger is not None:
+        prediction_logger.log(
+            endpoint=endpoint,
+            model_version=model_version,
+            inputs=input_data,
+            prediction=response.prediction,
+            confidence=response.confidence,
+            latency_ms=(time.perf_counter() - started) * 1000
+        )
+
 # Prediction endpoint
-@app.post("/api/predict", response_model=PredictionResponse, tags=["Prediction"])
-async def predict_sleep_disorder(request: PredictionRequest):
+@app.post("/api/predict", response_model=PredictionResponse, response_model_exclude_none=True, tags=["Prediction"])
+async def predict_sleep_disorder(
+    request: PredictionRequest,
+    explain: bool = Query(False, description="Include the decision path and the features that drove the prediction"),
+    caller: Optional[Caller] = Depends(require_caller)
+):
     """
     Predict sleep disorder based on health and lifestyle data
     
@@ -200,63 +546,30 @@ async def predict_sleep_disorder(request: PredictionRequest):
             detail="Model not loaded. Please ensure the model file exists."
         )
     
+    started = time.perf_counter()
     try:
-        # Get model components
-        model = model_data['model']
-        label_encoders = model_data['label_encoders']
-        feature_names = model_data['feature_names']
-        
         # Prepare input data
-        input_data = {
-            "Gender": request.gender,
-            "Age": request.age,
-            "Occupation": request.occupation,
-            "Sleep Duration": request.sleep_duration,
-            "Quality of Sleep": request.quality_of_sleep,
-            "Physical Activity Level": request.physical_activity_level,
-            "Stress Level": request.stress_level,
-            "BMI Category": request.bmi_category,
-            "Heart Rate": request.heart_rate,
-            "Daily Steps": request.daily_steps,
-            "SystolicBP": request.systolic_bp,
-            "DiastolicBP": request.diastolic_bp
-        }
-        
-        # Encode categorical variables
-        encoded_data = input_data.copy()
-        for col, le in label_encoders.items():
-            if col in encoded_data and col != 'Sleep Disorder':
-                try:
-                    encoded_data[col] = le.transform([encoded_data[col]])[0]
-                except ValueError:
-                    # Handle unknown categories
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid value for {col}. Valid values are: {', '.join(le.classes_)}"
-                    )
-        
-        # Create DataFrame for prediction
-        input_df = pd.DataFrame([encoded_data], columns=feature_names)
-        
-        # Make prediction
-        prediction = model.predict(input_df)[0]
-        prediction_proba = model.predict_proba(input_df)[0]
+        input_data = request_features(request)
         
-        # Decode prediction
-        predicted_disorder = label_encoders['Sleep Disorder'].inverse_transform([prediction])[0]
-        confidence = float(max(prediction_proba)) * 100
+        if drift_monitor is not None:
+            drift_monitor.observe(input_data)
         
-        # Generate response message
-        if predicted_disorder == "None":
-            message = "No sleep disorder detected. Maintain healthy lifestyle habits!"
-        else:
-            message = f"Potential sleep disorder detected: {predicted_disorder}. Consider consulting a healthcare professional."
+        # Encode and predict
+        try:
+            with span("encode"):
+                row = inference_service.encode(input_data)
+        except UnknownCategoryError as e:
+            # Handle unknown categories
+            raise HTTPException(status_code=400, detail=str(e))
+        with span("model"):
+            result = inference_service.predict_row(row)
         
-        return PredictionResponse(
-            prediction=predicted_disorder,
-            confidence=round(confidence, 2),
-            message=message
-        )
+        with span("response"):
+            response = build_response(result, explain)
+            log_prediction("/api/predict", input_data, response, started)
+        if caller is not None:
+            usage_tracker.record_rows(caller, 1)
+        return response
         
     except HTTPException:
         raise
@@ -268,22 +581,204 @@ async def predict_sleep_disorder(request: PredictionRequest):
 
 # Batch prediction endpoint (optional - useful for testing)
 @app.post("/api/predict/batch", tags=["Prediction"])
-async def predict_batch(requests: list[PredictionRequest]):
+async def predict_batch(
+    requests: list[dict],
+    explain: bool = Query(False, description="Include the decision path and the features that drove each prediction"),
+    caller: Optional[Caller] = Depends(require_caller)
+):
     """
     Predict sleep disorders for multiple inputs at once
+    
+    Rows use the same fields and rules as /api/predict. The whole batch is
+    validated column by column and the valid rows are scored together in one
+    vectorized pass over the tree. Invalid rows report the failing field and
+    reason; the allowed values of each failing field are listed once under "allowed".
     """
     if model_data is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
+    if len(requests) > admission.max_batch_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(requests)} rows (limit {admission.max_batch_size}). Use /api/jobs for larger batches."
+        )
+    require_row_allowance(caller, len(requests))
     
-    results = []
-    for idx, request in enumerate(requests):
-        try:
-            result = await predict_sleep_disorder(request)
-            results.append({"index": idx, "success": True, "result": result})
-        except Exception as e:
-            results.append({"index": idx, "success": False, "error": str(e)})
+    started = time.perf_counter()
+    with span("encode"):
+        # Explicit columns keep one row per input, even for empty objects
+        frame = pd.DataFrame.from_records(requests, columns=list(REQUEST_FIELDS))
+        validated = inference_service.validate_frame(frame)
+        rows = np.flatnonzero(validated.valid)
+        inputs = inference_service.feature_dicts(validated.X[rows])
+        if drift_monitor is not None:
+            # Rejected rows count too, so unknown categories show up in the drift stats
+            drift_monitor.observe_frame(inference_service.feature_frame(frame, validated))
+    
+    try:
+        with span("model"):
+            predictions = inference_service.predict_rows(validated.X[rows])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+    if caller is not None:
+        usage_tracker.record_rows(caller, len(rows))
+    
+    with span("response"):
+        results = [None] * len(requests)
+        for idx, error in validated.errors():
+            results[idx] = {"index": idx, "success": False, "error": error}
+        # Rows landing in the same leaf share one response
+        leaf_responses = {}
+        for idx, input_data, result in zip(rows.tolist(), inputs, predictions):
+            if result.leaf not in leaf_responses:
+                response = build_response(result, explain)
+                leaf_responses[result.leaf] = (response, response.dict(exclude_none=True))
+            response, result_body = leaf_responses[result.leaf]
+            log_prediction("/api/predict/batch", input_data, response, started)
+            results[idx] = {"index": idx, "success": True, "result": result_body}
     
-    return {"predictions": results, "total": len(requests)}
+    with span("serialize"):
+        body = {"predictions": results, "total": len(requests)}
+        error_fields = validated.error_fields()
+        if error_fields:
+            body["allowed"] = {field: inference_service.allowed_values(field) for field in error_fields}
+        # Plain JSON types only, so skip FastAPI's per-value jsonable_encoder pass
+        return JSONResponse(content=body)
+
+# CPU profiling of live traffic (disabled unless PROFILING_ADMIN_TOKEN is set)
+cpu_profiler = profiling.CPUProfiler()
+
+@app.get("/admin/profile", response_class=PlainTextResponse, include_in_schema=False)
+async def profile_live_traffic(
+    request: Request,
+    seconds: float = Query(10, gt=0, description="How long to profile for"),
+    sort: str = Query("cumulative", description="pstats sort key, e.g. cumulative or tottime"),
+    limit: int = Query(40, ge=1, le=500, description="Number of functions to report")
+):
+    """
+    Profile this worker's event loop for a number of seconds and return the pstats report
+    
+    Only code running on the event loop thread is profiled; threadpool work
+    such as background jobs is not. Under gunicorn each call profiles a single worker.
+    """
+    admin_token = os.getenv("PROFILING_ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    max_seconds = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+    if seconds > max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {max_seconds}")
+    
+    if sort not in profiling.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(sorted(profiling.SORT_KEYS))}")
+    
+    profile = cpu_profiler.start()
+    if profile is None:
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        report = cpu_profiler.stop(profile, sort=sort, limit=limit)
+    return report
+
+# Job endpoints for batches too large for a single request
+def require_job_runner():
+    if model_data is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if job_runner is None:
+        raise HTTPException(status_code=503, detail="Background jobs are disabled")
+    return job_runner
+
+async def job_status(job_id: str, caller: Optional[Caller] = None):
+    job = await run_in_threadpool(require_job_runner().store.get, job_id)
+    # Another tenant's job looks the same as a missing one
+    if job is None or (caller is not None and job["tenant"] != caller.tenant):
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    total = job["total"]
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "total": total,
+        "processed": job["processed"],
+        "progress": round(job["processed"] / total * 100, 2) if total else None,
+        "chunks_ready": job["chunks"],
+        "chunk_size": job["chunk_size"],
+        "error": job["error"]
+    }
+
+def parse_job_records(body: bytes) -> list:
+    """Parse a JSON job body; runs in the threadpool so large bodies don't block the event loop"""
+    try:
+        records = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise HTTPException(status_code=422, detail="Job body must be a JSON list of objects")
+    return records
+
+@app.post(
+    "/api/jobs",
+    status_code=202,
+    tags=["Jobs"],
+    openapi_extra={"requestBody": {"required": True, "content": {"application/json": {
+        "schema": {"type": "array", "items": {"type": "object"}}
+    }}}}
+)
+async def submit_job(request: Request, caller: Optional[Caller] = Depends(require_caller)):
+    """
+    Submit a large batch for background scoring
+    
+    Rows use the same fields as /api/predict. Poll /api/jobs/{job_id} for progress.
+    The body is limited to ADMISSION_MAX_JOB_JSON_BODY_BYTES; upload larger inputs to /api/jobs/file.
+    Rows count against the API key's daily job row quota.
+    """
+    runner = require_job_runner()
+    body = await request.body()
+    records = await run_in_threadpool(parse_job_records, body)
+    require_job_row_allowance(caller, len(records))
+    job_id = await run_in_threadpool(runner.submit_records, records, caller)
+    return await job_status(job_id, caller)
+
+@app.post("/api/jobs/file", status_code=202, tags=["Jobs"])
+async def submit_job_file(
+    file: UploadFile = File(..., description="CSV with a header row of /api/predict field names"),
+    caller: Optional[Caller] = Depends(require_caller)
+):
+    """Submit a CSV file for background scoring; rows count against the API key's daily job row quota"""
+    runner = require_job_runner()
+    rows = await run_in_threadpool(count_rows, file.file)
+    require_job_row_allowance(caller, rows)
+    job_id = await run_in_threadpool(runner.submit_file, file.file, caller, rows)
+    return await job_status(job_id, caller)
+
+@app.get("/api/jobs/{job_id}", tags=["Jobs"])
+async def get_job(job_id: str, caller: Optional[Caller] = Depends(require_caller)):
+    """Get a job's status and progress"""
+    return await job_status(job_id, caller)
+
+@app.get("/api/jobs/{job_id}/results", tags=["Jobs"])
+async def get_job_results(
+    job_id: str,
+    chunk: int = Query(0, ge=0, description="Result chunk to download"),
+    caller: Optional[Caller] = Depends(require_caller)
+):
+    """
+    Download one chunk of a job's results
+    
+    Chunks become available as the job runs; follow next_chunk until it is null.
+    """
+    status_info = await job_status(job_id, caller)
+    chunk_data = await run_in_threadpool(job_runner.store.results, job_id, chunk)
+    if chunk_data is None:
+        raise HTTPException(status_code=404, detail=f"Chunk {chunk} is not available yet ({status_info['chunks_ready']} ready)")
+    has_more = chunk + 1 < status_info["chunks_ready"] or status_info["status"] not in ("completed", "failed")
+    return {
+        "job_id": job_id,
+        "chunk": chunk,
+        "start": chunk_data["start"],
+        "results": chunk_data["results"],
+        "next_chunk": chunk + 1 if has_more else None
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,17 +1,14 @@
-import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-import joblib
+import pandas as pd
 import streamlit as st
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions, SupabaseAuthClient
 from dotenv import load_dotenv
 import os
 
+from auth_session import SessionCache
+from inference import InferenceService, UnknownCategoryError, load_service, MODEL_PATH
+from sleep_disorder_train import train_model
+
 # Load environment variables
 load_dotenv()
 
@@ -23,65 +20,77 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     st.error("⚠️ Supabase credentials not found. Please set SUPABASE_URL and SUPABASE_KEY in .env file")
     st.stop()
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# --- Data Load ---
-df = pd.read_csv('Sleep_health_and_lifestyle_dataset.csv')
-print("Dataset shape:", df.shape)
-print(df.head())
-
-# --- Data Preprocessing ---
-# Fill missing Sleep Disorder values with None
-df['Sleep Disorder'] = df['Sleep Disorder'].fillna('None')
-
-# Drop Person ID
-df = df.drop('Person ID', axis=1)
-
-# Split Blood Pressure into SystolicBP and DiastolicBP
-bp_split = df['Blood Pressure'].str.split('/', expand=True).astype(int)
-df['SystolicBP'], df['DiastolicBP'] = bp_split[0], bp_split[1]
-df = df.drop('Blood Pressure', axis=1)
-
-print(df.info())
-
-# --- Encode Categorical Variables ---
-categorical_cols = ['Gender', 'Occupation', 'BMI Category', 'Sleep Disorder']
-label_encoders = {}
-for col in categorical_cols:
-    le = LabelEncoder()
-    df[col] = le.fit_transform(df[col])
-    label_encoders[col] = le
-    print(f"{col} classes: {le.classes_}")
-
-print(df.head())
-
-# --- Train-Test Split ---
-X = df.drop('Sleep Disorder', axis=1)
-y = df['Sleep Disorder']
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-print("Training set size:", X_train.shape)
-print("Test set size:", X_test.shape)
-
-# --- Train Decision Tree Model ---
-model = DecisionTreeClassifier(max_depth=5, min_samples_split=2, min_samples_leaf=2, random_state=42)
-model.fit(X_train, y_train)
-print("Model trained successfully!")
-
-# --- Model Evaluation ---
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Model Accuracy: {accuracy*100:.2f}%")
-print("Classification Report:\n", classification_report(y_test, y_pred, target_names=label_encoders['Sleep Disorder'].classes_))
-
-# --- Save model and encoders ---
-model_data = {
-    'model': model,
-    'label_encoders': label_encoders,
-    'feature_names': list(X.columns)
+@st.cache_resource
+def get_supabase_client() -> Client:
+    """Create the Supabase client once per process and share it across browser sessions"""
+    # Only calls that take the user's token as an argument may use this client;
+    # sessions are kept per browser session in st.session_state (see auth_session.py)
+    options = ClientOptions(auto_refresh_token=False, persist_session=False)
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
+
+def new_auth_client() -> SupabaseAuthClient:
+    """Short-lived auth client for calls that store a session on the client (sign-in, sign-up, refresh)"""
+    client = get_supabase_client()
+    return SupabaseAuthClient(
+        url=str(client.auth_url),
+        headers=dict(client.options.headers),
+        auto_refresh_token=False,
+        persist_session=False
+    )
+
+@st.cache_resource
+def get_session_cache() -> SessionCache:
+    """Process-wide cache of validated sessions, see auth_session.py"""
+    return SessionCache(get_supabase_client().auth, new_auth_client)
+
+supabase: Client = get_supabase_client()
+session_cache = get_session_cache()
+
+# --- Load Model ---
+@st.cache_resource(show_spinner=False)
+def get_inference_service() -> InferenceService:
+    """Load the model once per process and share it across browser sessions"""
+    if not os.path.exists(MODEL_PATH):
+        train_model()
+    return load_service(MODEL_PATH)
+
+service = get_inference_service()
+label_encoders = service.label_encoders
+
+# Feature -> (label, min, max, default, step) for each slider
+SLIDERS = {
+    "Age": ("Age", 10, 100, 30, 1),
+    "Sleep Duration": ("Sleep Duration (hours)", 0.0, 12.0, 7.0, 0.1),
+    "Quality of Sleep": ("Quality of Sleep (1-10)", 1, 10, 5, 1),
+    "Stress Level": ("Stress Level (1-10)", 1, 10, 5, 1),
+    "Physical Activity Level": ("Physical Activity Level (1-10)", 1, 10, 5, 1),
+    "Daily Steps": ("Daily Steps", 0, 20000, 5000, 100),
+    "Heart Rate": ("Heart Rate (bpm)", 40, 150, 75, 1),
+    "SystolicBP": ("Systolic Blood Pressure (mmHg)", 90, 180, 120, 1),
+    "DiastolicBP": ("Diastolic Blood Pressure (mmHg)", 60, 120, 80, 1),
 }
-joblib.dump(model_data, 'sleepdisordermodel.pkl')
-print("Model saved successfully as sleepdisordermodel.pkl")
+
+def feature_slider(feature):
+    label, low, high, default, step = SLIDERS[feature]
+    return st.slider(label, low, high, default, step=step)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def what_if_curves(inputs):
+    """
+    Prediction curves over every slider's full range for the given inputs
+
+    All sliders are evaluated in one batched pass and cached, so exploring
+    a single variable does not need a prediction per slider position.
+    """
+    grids = {}
+    for feature, (_, low, high, _, step) in SLIDERS.items():
+        points = int(round((high - low) / step)) + 1
+        grids[feature] = np.round(np.linspace(low, high, points), 2)
+    curves = service.sensitivity_curves(dict(inputs), grids)
+    return {
+        feature: pd.DataFrame(proba * 100, index=pd.Index(values, name=SLIDERS[feature][0]), columns=service.target_labels)
+        for feature, (values, proba) in curves.items()
+    }
 
 # --- Streamlit App ---
 
@@ -140,39 +149,53 @@ st.markdown("""
 
 # --- Authentication Functions ---
 
+def set_authenticated(user, tokens):
+    """Store the signed-in user and their session tokens for this browser session"""
+    st.session_state.authenticated = True
+    st.session_state.user = user
+    st.session_state.auth_tokens = tokens
+    # Check if user just verified email
+    if user.email_confirmed_at and not st.session_state.get('verified_shown', False):
+        st.session_state.verification_success = True
+        st.session_state.verified_shown = True
+
+def clear_authentication():
+    """Forget the signed-in user for this browser session"""
+    st.session_state.authenticated = False
+    st.session_state.user = None
+    st.session_state.auth_tokens = None
+
 def init_session_state():
-    """Initialize session state variables and check for existing session"""
+    """Initialize session state variables and validate the existing session"""
     if 'authenticated' not in st.session_state:
         st.session_state.authenticated = False
     if 'user' not in st.session_state:
         st.session_state.user = None
-    if 'session_checked' not in st.session_state:
-        st.session_state.session_checked = False
+    if 'auth_tokens' not in st.session_state:
+        st.session_state.auth_tokens = None
     if 'verification_success' not in st.session_state:
         st.session_state.verification_success = False
     
-    # Check for existing Supabase session on first load
-    if not st.session_state.session_checked:
-        try:
-            session = supabase.auth.get_session()
-            if session and session.user:
-                st.session_state.authenticated = True
-                st.session_state.user = session.user
-                # Check if user just verified email
-                if session.user.email_confirmed_at and not st.session_state.get('verified_shown', False):
-                    st.session_state.verification_success = True
-                    st.session_state.verified_shown = True
-        except Exception as e:
-            pass  # No valid session
-        st.session_state.session_checked = True
+    # Validate this browser session's tokens; cached, so most reruns skip the round-trip
+    if st.session_state.auth_tokens:
+        user, tokens = session_cache.validate(st.session_state.auth_tokens)
+        if user:
+            set_authenticated(user, tokens)
+        elif tokens is None:
+            clear_authentication()
+        else:
+            # Auth service unreachable and nothing cached yet; keep the tokens and retry on the next run
+            st.warning("⚠️ Could not reach the authentication service. Please try again in a moment.")
+            st.stop()
 
 def sign_up_with_password(email, password):
     """Sign up a new user with email and password"""
     try:
-        response = supabase.auth.sign_up({
-            "email": email,
-            "password": password
-        })
+        with new_auth_client() as auth:
+            response = auth.sign_up({
+                "email": email,
+                "password": password
+            })
         if response.user:
             return True, "Account created successfully! Please check your email to verify your account."
         return False, "Sign up failed. Please try again."
@@ -182,14 +205,12 @@ def sign_up_with_password(email, password):
 def sign_in_with_password(email, password):
     """Sign in with email and password"""
     try:
-        response = supabase.auth.sign_in_with_password({
+        user, tokens = session_cache.sign_in({
             "email": email,
             "password": password
         })
-        if response.user and response.session:
-            st.session_state.authenticated = True
-            st.session_state.user = response.user
-            # Session is automatically stored by Supabase client
+        if user:
+            set_authenticated(user, tokens)
             return True, "Login successful!"
         return False, "Invalid credentials"
     except Exception as e:
@@ -198,10 +219,8 @@ def sign_in_with_password(email, password):
 def sign_out():
     """Sign out the current user"""
     try:
-        supabase.auth.sign_out()
-        st.session_state.authenticated = False
-        st.session_state.user = None
-        st.session_state.session_checked = False
+        session_cache.sign_out(st.session_state.auth_tokens)
+        clear_authentication()
         st.rerun()
     except Exception as e:
         st.error(f"Error signing out: {str(e)}")
@@ -267,17 +286,6 @@ def authentication_ui():
                 else:
                     st.warning("⚠️ Please fill in all fields")
 
-def encode_input(inputs, label_encoders):
-    # Replace "" with default 'unknown' encoding: here 0 for simplicity
-    for col, le in label_encoders.items():
-        if col in inputs:
-            val = inputs[col]
-            if val == "" or val not in le.classes_:
-                inputs[col] = 0
-            else:
-                inputs[col] = le.transform([val])[0]
-    return inputs
-
 def sleep_disorder_prediction_ui():
     # Display user info and logout button
     col1, col2 = st.columns([3, 1])
@@ -297,7 +305,7 @@ def sleep_disorder_prediction_ui():
     col1, col2 = st.columns(2)
     with col1:
         gender = st.selectbox("Gender", ["Select Gender"] + list(label_encoders['Gender'].classes_), index=0)
-        age = st.slider("Age", 10, 100, 30)
+        age = feature_slider("Age")
     with col2:
         occupation = st.selectbox("Occupation", ["Select Occupation"] + list(label_encoders['Occupation'].classes_), index=0)
         bmi_category = st.selectbox("BMI Category", ["Select BMI Category"] + list(label_encoders['BMI Category'].classes_), index=0)
@@ -306,21 +314,21 @@ def sleep_disorder_prediction_ui():
     st.subheader("😴 Sleep & Lifestyle")
     col1, col2 = st.columns(2)
     with col1:
-        sleep_duration = st.slider("Sleep Duration (hours)", 0.0, 12.0, 7.0, step=0.1)
-        quality_of_sleep = st.slider("Quality of Sleep (1-10)", 1, 10, 5)
-        stress_level = st.slider("Stress Level (1-10)", 1, 10, 5)
+        sleep_duration = feature_slider("Sleep Duration")
+        quality_of_sleep = feature_slider("Quality of Sleep")
+        stress_level = feature_slider("Stress Level")
     with col2:
-        physical_activity_level = st.slider("Physical Activity Level (1-10)", 1, 10, 5)
-        daily_steps = st.slider("Daily Steps", 0, 20000, 5000, step=100)
+        physical_activity_level = feature_slider("Physical Activity Level")
+        daily_steps = feature_slider("Daily Steps")
     
     st.markdown("---")
     st.subheader("❤️ Health Metrics")
     col1, col2 = st.columns(2)
     with col1:
-        heart_rate = st.slider("Heart Rate (bpm)", 40, 150, 75)
-        systolic_bp = st.slider("Systolic Blood Pressure (mmHg)", 90, 180, 120)
+        heart_rate = feature_slider("Heart Rate")
+        systolic_bp = feature_slider("SystolicBP")
     with col2:
-        diastolic_bp = st.slider("Diastolic Blood Pressure (mmHg)", 60, 120, 80)
+        diastolic_bp = feature_slider("DiastolicBP")
 
     user_inputs = {
         "Gender": gender,
@@ -337,10 +345,6 @@ def sleep_disorder_prediction_ui():
         "DiastolicBP": diastolic_bp
     }
 
-    encoded_inputs = encode_input(user_inputs.copy(), label_encoders)
-
-    input_df = pd.DataFrame([encoded_inputs], columns=model_data['feature_names'])
-
     st.markdown("---")
     
     # Center the predict button
@@ -349,9 +353,14 @@ def sleep_disorder_prediction_ui():
         predict_btn = st.button("🔮 Predict Sleep Disorder", key="predict_btn", use_container_width=True)
     
     if predict_btn:
-        with st.spinner("Analyzing your data..."):
-            prediction = model.predict(input_df)[0]
-            pred_label = label_encoders['Sleep Disorder'].inverse_transform([prediction])[0]
+        try:
+            with st.spinner("Analyzing your data..."):
+                result = service.predict_one(user_inputs)
+        except UnknownCategoryError as e:
+            # Placeholder options are not valid categories
+            st.warning(f"⚠️ Please select a {e.column}")
+            return
+        pred_label = result.label
         
         st.markdown("---")
         st.subheader("📊 Prediction Result")
@@ -363,6 +372,19 @@ def sleep_disorder_prediction_ui():
         else:
             st.warning(f"⚠️ **Result:** {pred_label} detected")
             st.info("💡 Consider consulting a healthcare professional for proper diagnosis and treatment.")
+        st.caption(f"Confidence: {result.confidence:.1f}%")
+    
+    # What-if curves: one cached batch covers the full range of every slider
+    st.markdown("---")
+    with st.expander("📈 What-if: how each input changes the prediction"):
+        try:
+            curves = what_if_curves(tuple(user_inputs.items()))
+        except UnknownCategoryError as e:
+            st.info(f"💡 Select a {e.column} to see what-if curves")
+        else:
+            feature = st.selectbox("Input to vary", list(SLIDERS), format_func=lambda f: SLIDERS[f][0], key="what_if_feature")
+            st.line_chart(curves[feature])
+            st.caption(f"Probability (%) of each outcome across the full {SLIDERS[feature][0]} range, with all other inputs as entered above.")
 
 if __name__ == "__main__":
     # Initialize session state
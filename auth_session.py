@@ -0,0 +1,145 @@
+"""
+Process-wide cache for Supabase session validation.
+
+The Supabase client is shared across every browser session, so it must never
+hold a user's session. Its auth client only makes calls that take the user's
+token as an argument (``get_user``, ``admin.sign_out``). Signing in and
+refreshing store the new session on whichever auth client made the call, so
+they go through a short-lived client from ``new_auth`` instead.
+
+Each browser session holds its own tokens, and this cache maps access tokens
+to validated users until the token is close to expiry, when it is refreshed
+with the refresh token instead.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+
+def tokens_from_session(session):
+    """Extract the fields we keep per browser session from a Supabase Session"""
+    return {
+        "access_token": session.access_token,
+        "refresh_token": session.refresh_token,
+        "expires_at": session.expires_at or (time.time() + (session.expires_in or 0)),
+    }
+
+
+def is_auth_rejection(error):
+    """
+    True if the auth service rejected the token or credentials
+
+    Supabase auth errors carry an HTTP ``status``. Timeouts, connection errors,
+    rate limiting and 5xx responses (status 0, 408, 429 or >= 500, or no status
+    at all) are transient and say nothing about the session.
+    """
+    status = getattr(error, "status", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
+
+
+class SessionCache:
+    """
+    Validates session tokens against the auth service, caching the result
+
+    ``auth`` is the ``client.auth`` object of the shared Supabase client (or
+    anything with the same ``get_user`` and ``admin.sign_out`` methods).
+    ``new_auth`` returns a fresh, closeable auth client for
+    ``sign_in_with_password`` and ``refresh_session``. A cached user is reused
+    for ``validate_ttl`` seconds; tokens within ``refresh_margin`` seconds of
+    expiry are refreshed. If the auth service cannot be reached, a previously
+    validated user is kept until it can.
+    """
+
+    def __init__(self, auth, new_auth, validate_ttl=300, refresh_margin=60, max_entries=1024, clock=time.time):
+        self.auth = auth
+        self.new_auth = new_auth
+        self.validate_ttl = validate_ttl
+        self.refresh_margin = refresh_margin
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, access_token, user):
+        with self._lock:
+            self._entries[access_token] = (user, self.clock())
+            self._entries.move_to_end(access_token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _forget(self, access_token):
+        with self._lock:
+            self._entries.pop(access_token, None)
+
+    def _cached(self, access_token):
+        with self._lock:
+            return self._entries.get(access_token)
+
+    def store(self, session):
+        """Cache a freshly signed-in session and return its tokens"""
+        tokens = tokens_from_session(session)
+        self._remember(tokens["access_token"], session.user)
+        return tokens
+
+    def sign_in(self, credentials):
+        """Sign in with ``{"email", "password"}``; returns ``(user, tokens)``, or ``(None, None)``"""
+        with closing(self.new_auth()) as auth:
+            response = auth.sign_in_with_password(credentials)
+        if not response or not response.user or not response.session:
+            return None, None
+        return response.user, self.store(response.session)
+
+    def _unreachable(self, entry, tokens):
+        # The auth service could not answer; keep the last validated user, if any,
+        # and try again on a later call. (None, tokens) means "unknown for now".
+        return (entry[0] if entry is not None else None), tokens
+
+    def validate(self, tokens):
+        """
+        Return ``(user, tokens)`` for a browser session's tokens
+
+        ``tokens`` may come back refreshed and should be stored again.
+        Returns ``(None, None)`` when the auth service rejects the session, and
+        ``(None, tokens)`` when it cannot be reached and no user is cached yet.
+        """
+        if not tokens:
+            return None, None
+        now = self.clock()
+        access_token = tokens["access_token"]
+        entry = self._cached(access_token)
+
+        if now >= tokens["expires_at"] - self.refresh_margin:
+            try:
+                with closing(self.new_auth()) as auth:
+                    response = auth.refresh_session(tokens["refresh_token"])
+            except Exception as e:
+                if not is_auth_rejection(e):
+                    return self._unreachable(entry, tokens)
+                response = None
+            self._forget(access_token)
+            if not response or not response.session:
+                return None, None
+            return response.session.user, self.store(response.session)
+
+        if entry is not None and now - entry[1] < self.validate_ttl:
+            return entry[0], tokens
+
+        try:
+            response = self.auth.get_user(access_token)
+        except Exception as e:
+            if not is_auth_rejection(e):
+                return self._unreachable(entry, tokens)
+            response = None
+        if not response or not response.user:
+            self._forget(access_token)
+            return None, None
+        self._remember(access_token, response.user)
+        return response.user, tokens
+
+    def sign_out(self, tokens):
+        """Revoke a browser session's tokens and drop them from the cache"""
+        if not tokens:
+            return
+        self._forget(tokens["access_token"])
+        self.auth.admin.sign_out(tokens["access_token"])
@@ -0,0 +1,47 @@
+"""
+Shared fixtures: a valid request body, the inference service, and the API app under test
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from inference import load_service
+
+# A valid /api/predict body
+EXAMPLE = {
+    "gender": "Male", "age": 30, "occupation": "Doctor", "sleep_duration": 7.5,
+    "quality_of_sleep": 8, "physical_activity_level": 6, "stress_level": 5,
+    "bmi_category": "Normal", "heart_rate": 75, "daily_steps": 8000,
+    "systolic_bp": 120, "diastolic_bp": 80,
+}
+
+
+@pytest.fixture
+def example():
+    return dict(EXAMPLE)
+
+
+@pytest.fixture(scope="module")
+def service():
+    return load_service()
+
+
+@pytest.fixture
+def api_env(monkeypatch, tmp_path):
+    """
+    Environment for starting api.app: no job workers or drift reference data,
+    and prediction logs under tmp_path instead of the repo. Tests can set more
+    variables on the returned monkeypatch before starting the app.
+    """
+    monkeypatch.setenv("JOBS_ENABLED", "false")
+    monkeypatch.setenv("JOB_STORE_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setenv("DRIFT_ENABLED", "false")
+    monkeypatch.setenv("PREDICTION_LOG_DIR", str(tmp_path / "prediction_logs"))
+    return monkeypatch
+
+
+@pytest.fixture
+def app_client(api_env):
+    """TestClient for api.app with startup and shutdown hooks run"""
+    with TestClient(api.app) as client:
+        yield client
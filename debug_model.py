@@ -1,84 +1,253 @@
 """
-Debug script to check model expectations and test API validation
+Model diagnostics and pre-deploy check for a model artifact
+
+    python debug_model.py                                   # current model, valid values, timings
+    python debug_model.py --model new.pkl --requests requests.csv --max-invalid-rate 0.01
+
+Loads the artifact through the same InferenceService as the API, prints the
+valid categorical values and the tree's shape, validates a file of candidate
+requests (CSV, JSON lines or a JSON list of /api/predict bodies) in one
+vectorized pass, checks the service's predictions against model.predict, and
+measures single-row and batch latency and memory. Exits with status 1 if the
+artifact fails to load or any check fails, so it can gate a deploy.
 """
-import joblib
+import argparse
 import json
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from collections import Counter
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+import process_stats
+from inference import MODEL_PATH, InferenceService
+from sleep_disorder_train import load_dataset
+
+
+def load_requests(path):
+    """Read candidate requests from CSV, JSON lines or a JSON list"""
+    if path.endswith(".csv"):
+        return pd.read_csv(path)
+    with open(path) as f:
+        first = f.read(1)
+    if first == "[":
+        with open(path) as f:
+            return pd.DataFrame.from_records(json.load(f))
+    return pd.read_json(path, lines=True)
+
+
+def load_artifact(path):
+    """Load an artifact, timing it and measuring the memory it retains"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        model_data = joblib.load(path)
+    service = InferenceService(model_data, cache_size=0)
+    load_seconds = time.perf_counter() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # scikit-learn only reports the version an estimator was pickled with when it differs
+    pickled_with = sklearn.__version__
+    for warning in caught:
+        pickled_with = getattr(warning.message, "original_sklearn_version", pickled_with)
+    return service, {
+        "path": path,
+        "size_bytes": os.path.getsize(path),
+        "load_ms": round(load_seconds * 1000, 1),
+        "retained_bytes": retained,
+        "peak_load_bytes": peak,
+        "sklearn_version": pickled_with,
+        "sklearn_runtime_version": sklearn.__version__,
+    }
+
+
+def tree_summary(service):
+    tree = service.model.tree_
+    return {
+        "depth": int(service.model.get_depth()),
+        "nodes": int(tree.node_count),
+        "leaves": int(service.model.get_n_leaves()),
+        "features": service.feature_names,
+        "classes": service.target_labels,
+    }
+
+
+def validation_summary(service, frame, show=5):
+    validated = service.validate_frame(frame)
+    errors = validated.errors()
+    by_reason = Counter((error["field"], error["reason"]) for _, error in errors)
+    return validated, {
+        "rows": len(frame),
+        "valid": int(validated.valid.sum()),
+        "invalid": len(errors),
+        "invalid_rate": len(errors) / len(frame) if len(frame) else 0.0,
+        "errors": [
+            {"field": field, "reason": reason, "rows": count}
+            for (field, reason), count in by_reason.most_common()
+        ],
+        "examples": [{"row": row, **error} for row, error in errors[:show]],
+    }
+
+
+def parity_mismatches(service, X):
+    """Rows where the service disagrees with model.predict"""
+    if len(X) == 0:
+        return 0
+    classes, _ = service.predict_encoded(X)
+    expected = service.model.predict(pd.DataFrame(X, columns=service.feature_names))
+    return int((classes != expected).sum())
+
+
+def latency(service, X, single_rows=2000, batch_size=1000, repeats=20):
+    """Per-call latency of uncached single-row and batch prediction, in microseconds"""
+    rows = X[:single_rows].tolist()
+    timings = []
+    for row in rows:
+        started = time.perf_counter()
+        service.predict_row(row)
+        timings.append(time.perf_counter() - started)
+    single = np.array(timings) * 1e6
+
+    batch = X[np.arange(batch_size) % len(X)]
+    batch_timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        service.predict_rows(batch)
+        batch_timings.append(time.perf_counter() - started)
+    batch_us = np.array(batch_timings) * 1e6
+    return {
+        "single_p50_us": round(float(np.percentile(single, 50)), 2),
+        "single_p99_us": round(float(np.percentile(single, 99)), 2),
+        "batch_size": batch_size,
+        "batch_p50_us": round(float(np.percentile(batch_us, 50)), 1),
+        "batch_per_row_us": round(float(np.percentile(batch_us, 50)) / batch_size, 3),
+    }
+
+
+def print_report(report):
+    artifact, tree = report["artifact"], report["tree"]
+    print("=" * 60)
+    print("ARTIFACT")
+    print("=" * 60)
+    print(f"Path: {artifact['path']} ({artifact['size_bytes'] / 1024:.1f} KB)")
+    print(f"Trained with scikit-learn {artifact['sklearn_version']}, running {artifact['sklearn_runtime_version']}")
+    print(f"Load time: {artifact['load_ms']} ms")
+    print(f"Memory: {artifact['retained_bytes'] / 1024:.1f} KB retained, {artifact['peak_load_bytes'] / 1024:.1f} KB peak while loading")
+    print(f"Process memory: {report['process_memory']}")
+    print(f"Tree: depth {tree['depth']}, {tree['nodes']} nodes, {tree['leaves']} leaves")
+
+    print("\n" + "=" * 60)
+    print("VALID VALUES")
+    print("=" * 60)
+    for field, values in report["options"].items():
+        print(f"{field}: {', '.join(values)}")
+    print(f"predictions: {', '.join(tree['classes'])}")
+    print("\nFeature order:")
+    for i, feature in enumerate(tree["features"]):
+        print(f"   {i}: {feature}")
+
+    validation = report.get("validation")
+    if validation is not None:
+        print("\n" + "=" * 60)
+        print("REQUEST VALIDATION")
+        print("=" * 60)
+        print(f"{validation['valid']}/{validation['rows']} rows valid ({validation['invalid_rate'] * 100:.2f}% invalid)")
+        for error in validation["errors"]:
+            print(f"   {error['field']}: {error['reason']} ({error['rows']} rows)")
+        for example in validation["examples"]:
+            print(f"   e.g. row {example['row']}: {example['field']} {example['reason']}")
+
+    print("\n" + "=" * 60)
+    print("LATENCY")
+    print("=" * 60)
+    timing = report["latency"]
+    if timing is None:
+        print("No valid rows to time")
+    else:
+        print(f"Single row: p50 {timing['single_p50_us']} µs, p99 {timing['single_p99_us']} µs (uncached)")
+        print(f"Batch of {timing['batch_size']}: {timing['batch_p50_us']} µs ({timing['batch_per_row_us']} µs/row)")
+
+    print("\n" + "=" * 60)
+    for check in report["checks"]:
+        print(f"{'✅' if check['passed'] else '❌'} {check['name']}: {check['detail']}")
+    print("=" * 60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diagnose a model artifact and validate candidate requests")
+    parser.add_argument("--model", default=MODEL_PATH, help="artifact to load")
+    parser.add_argument("--requests", help="CSV, JSON lines or JSON list of /api/predict requests")
+    parser.add_argument("--max-invalid-rate", type=float, default=0.0,
+                        help="fail if more than this fraction of the requests is invalid")
+    parser.add_argument("--max-single-p99-us", type=float, help="fail if uncached single-row p99 latency is higher")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        service, artifact = load_artifact(args.model)
+    except Exception as e:
+        print(f"❌ Could not load {args.model}: {e}")
+        return 1
+
+    report = {
+        "artifact": artifact,
+        "tree": tree_summary(service),
+        "options": {column: service.options(column) for column in service.encoding_tables},
+        "process_memory": process_stats.memory_usage(),
+    }
+    checks = []
+
+    if args.requests:
+        validated, report["validation"] = validation_summary(service, load_requests(args.requests))
+        X = validated.X[validated.valid]
+        rate = report["validation"]["invalid_rate"]
+        checks.append({
+            "name": "invalid requests",
+            "passed": rate <= args.max_invalid_rate,
+            "detail": f"{rate * 100:.2f}% (limit {args.max_invalid_rate * 100:.2f}%)",
+        })
+    else:
+        # No request file: time and check against the training data instead. Its
+        # rows are encoded directly since some fall outside the API's ranges.
+        dataset = load_dataset()
+        for column, table in service.encoding_tables.items():
+            dataset[column] = dataset[column].map(table)
+        X = dataset[service.feature_names].dropna().to_numpy(dtype=np.float64)
+
+    if len(X) == 0:
+        checks.append({"name": "model parity", "passed": False, "detail": "no valid rows to check"})
+        report["latency"] = None
+    else:
+        mismatches = parity_mismatches(service, X)
+        checks.append({
+            "name": "model parity",
+            "passed": mismatches == 0,
+            "detail": f"{mismatches} of {len(X)} rows differ from model.predict",
+        })
+        report["latency"] = latency(service, X)
+        if args.max_single_p99_us is not None:
+            p99 = report["latency"]["single_p99_us"]
+            checks.append({
+                "name": "single-row latency",
+                "passed": p99 <= args.max_single_p99_us,
+                "detail": f"p99 {p99} µs (limit {args.max_single_p99_us} µs)",
+            })
+    report["checks"] = checks
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+    return 0 if all(check["passed"] for check in checks) else 1
+
 
-# Load the model to see what it expects
-print("="*60)
-print("MODEL EXPECTATIONS")
-print("="*60)
-
-model_data = joblib.load('sleepdisordermodel.pkl')
-
-print("\n1. GENDER OPTIONS:")
-print(model_data['label_encoders']['Gender'].classes_)
-
-print("\n2. OCCUPATION OPTIONS:")
-for i, occ in enumerate(model_data['label_encoders']['Occupation'].classes_):
-    print(f"   {i}: {occ}")
-
-print("\n3. BMI CATEGORY OPTIONS:")
-print(model_data['label_encoders']['BMI Category'].classes_)
-
-print("\n4. SLEEP DISORDER OPTIONS (Predictions):")
-print(model_data['label_encoders']['Sleep Disorder'].classes_)
-
-print("\n5. FEATURE NAMES (in order):")
-for i, feat in enumerate(model_data['feature_names']):
-    print(f"   {i}: {feat}")
-
-# Create a test request
-print("\n" + "="*60)
-print("TEST REQUEST")
-print("="*60)
-
-test_request = {
-    "gender": "Male",
-    "age": 30,
-    "occupation": "Software Engineer",
-    "sleep_duration": 7.5,
-    "quality_of_sleep": 8,
-    "physical_activity_level": 6,
-    "stress_level": 5,
-    "bmi_category": "Normal",
-    "heart_rate": 75,
-    "daily_steps": 8000,
-    "systolic_bp": 120,
-    "diastolic_bp": 80
-}
-
-print("\nTest request (copy this for /docs):")
-print(json.dumps(test_request, indent=2))
-
-# Validate occupation
-print("\n" + "="*60)
-print("VALIDATION CHECK")
-print("="*60)
-
-occupation_test = test_request['occupation']
-if occupation_test in model_data['label_encoders']['Occupation'].classes_:
-    print(f"✅ Occupation '{occupation_test}' is valid")
-else:
-    print(f"❌ Occupation '{occupation_test}' is NOT valid")
-    print(f"Valid occupations are:")
-    for occ in model_data['label_encoders']['Occupation'].classes_:
-        print(f"   - {occ}")
-
-bmi_test = test_request['bmi_category']
-if bmi_test in model_data['label_encoders']['BMI Category'].classes_:
-    print(f"✅ BMI Category '{bmi_test}' is valid")
-else:
-    print(f"❌ BMI Category '{bmi_test}' is NOT valid")
-    print(f"Valid BMI categories are:")
-    for bmi in model_data['label_encoders']['BMI Category'].classes_:
-        print(f"   - {bmi}")
-
-print("\n" + "="*60)
-print("COMMON MISTAKES")
-print("="*60)
-print("1. Make sure occupation exactly matches one from the list above")
-print("2. Make sure BMI category exactly matches (case-sensitive)")
-print("3. All integer fields should be integers, not strings")
-print("4. sleep_duration should be a float (e.g., 7.5 not '7.5')")
-print("="*60)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Streaming feature drift monitoring against the training distribution.
+
+Bin edges and reference frequencies are computed once from the training
+dataset. Each request then costs one bisect and one counter increment per
+feature, recorded into a fixed ring of time windows, so memory does not grow
+with traffic. PSI, binned KS and category frequency deltas are computed only
+when statistics are read. Each worker process keeps its own windows, so under
+gunicorn the statistics cover one worker's share of the traffic.
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+NUMERIC_FEATURES = [
+    "Age", "Sleep Duration", "Quality of Sleep", "Physical Activity Level",
+    "Stress Level", "Heart Rate", "Daily Steps", "SystolicBP", "DiastolicBP",
+]
+CATEGORICAL_FEATURES = ["Gender", "Occupation", "BMI Category"]
+
+# Smoothing for empty bins so PSI stays finite
+PSI_EPSILON = 1e-4
+
+
+def load_training_frame(path="Sleep_health_and_lifestyle_dataset.csv"):
+    """Load the training dataset with blood pressure split the same way as in training"""
+    df = pd.read_csv(path)
+    bp_split = df["Blood Pressure"].str.split("/", expand=True).astype(int)
+    df["SystolicBP"], df["DiastolicBP"] = bp_split[0], bp_split[1]
+    return df
+
+
+def bin_edges(values, max_bins=10):
+    """Fixed bin edges: midpoints for low-cardinality features, quantiles otherwise"""
+    values = np.asarray(values, dtype=float)
+    unique = np.unique(values)
+    if len(unique) <= 2 * max_bins:
+        return ((unique[:-1] + unique[1:]) / 2).tolist()
+    quantiles = np.quantile(values, np.linspace(0, 1, max_bins + 1)[1:-1])
+    return np.unique(quantiles).tolist()
+
+
+class DriftMonitor:
+    """
+    Rolling-window drift statistics per feature
+
+    ``observe()`` is O(1) per request. Windows are a ring of ``num_windows``
+    buckets of ``window_seconds`` each; statistics cover the whole ring.
+    """
+
+    def __init__(self, reference, window_seconds=300, num_windows=12, max_bins=10):
+        self.window_seconds = window_seconds
+        self.num_windows = num_windows
+        self._lock = threading.Lock()
+
+        self.edges = {}
+        self.expected = {}
+        for feature in NUMERIC_FEATURES:
+            edges = bin_edges(reference[feature], max_bins)
+            counts = np.bincount(
+                np.searchsorted(edges, reference[feature].to_numpy(dtype=float), side="right"),
+                minlength=len(edges) + 1,
+            )
+            self.edges[feature] = edges
+            self.expected[feature] = counts / counts.sum()
+
+        self.categories = {}
+        for feature in CATEGORICAL_FEATURES:
+            freqs = reference[feature].value_counts(normalize=True)
+            self.categories[feature] = {cat: i for i, cat in enumerate(freqs.index)}
+            self.expected[feature] = freqs.to_numpy()
+
+        # Plain lists keep per-request increments cheap; one slot per bin,
+        # plus a trailing slot for unknown categories
+        self._buckets = [self._empty_bucket() for _ in range(num_windows)]
+        self._bucket_ids = [None] * num_windows
+
+    def _empty_bucket(self):
+        bucket = {"_total": 0}
+        for feature in NUMERIC_FEATURES:
+            bucket[feature] = [0] * (len(self.edges[feature]) + 1)
+        for feature in CATEGORICAL_FEATURES:
+            bucket[feature] = [0] * (len(self.categories[feature]) + 1)
+        return bucket
+
+    def _current_bucket(self, now):
+        bucket_id = int(now // self.window_seconds)
+        slot = bucket_id % self.num_windows
+        if self._bucket_ids[slot] != bucket_id:
+            self._buckets[slot] = self._empty_bucket()
+            self._bucket_ids[slot] = bucket_id
+        return self._buckets[slot]
+
+    def observe(self, inputs, now=None):
+        """Record one request's raw (unencoded) feature values"""
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._current_bucket(now)
+            bucket["_total"] += 1
+            for feature in NUMERIC_FEATURES:
+                value = inputs.get(feature)
+                if value is not None:
+                    bucket[feature][bisect_right(self.edges[feature], value)] += 1
+            for feature in CATEGORICAL_FEATURES:
+                index = self.categories[feature].get(inputs.get(feature), -1)
+                bucket[feature][index] += 1
+
+    def observe_frame(self, frame, now=None):
+        """Record many requests at once from a DataFrame of raw feature values (NaN/None = not given)"""
+        now = time.time() if now is None else now
+        counts = {}
+        for feature in NUMERIC_FEATURES:
+            if feature not in frame:
+                continue
+            values = pd.to_numeric(frame[feature], errors="coerce").to_numpy(dtype=float)
+            values = values[~np.isnan(values)]
+            edges = self.edges[feature]
+            counts[feature] = np.bincount(
+                np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1
+            ).tolist()
+        for feature in CATEGORICAL_FEATURES:
+            categories = self.categories[feature]
+            if feature in frame:
+                # Anything not a known category, including missing values, goes to the unknown slot
+                index = frame[feature].map(categories).fillna(len(categories)).to_numpy(dtype=np.int64)
+            else:
+                index = np.full(len(frame), len(categories), dtype=np.int64)
+            counts[feature] = np.bincount(index, minlength=len(categories) + 1).tolist()
+
+        with self._lock:
+            bucket = self._current_bucket(now)
+            bucket["_total"] += len(frame)
+            for feature, feature_counts in counts.items():
+                slots = bucket[feature]
+                for i, count in enumerate(feature_counts):
+                    slots[i] += count
+
+    def _window_counts(self, now):
+        oldest = int(now // self.window_seconds) - self.num_windows + 1
+        totals = {feature: np.zeros(len(counts), dtype=np.int64)
+                  for feature, counts in self._empty_bucket().items() if feature != "_total"}
+        total = 0
+        with self._lock:
+            for bucket_id, bucket in zip(self._bucket_ids, self._buckets):
+                if bucket_id is None or bucket_id < oldest:
+                    continue
+                total += bucket["_total"]
+                for feature in totals:
+                    totals[feature] += bucket[feature]
+        return total, totals
+
+    def stats(self, now=None):
+        """Drift statistics over the current rolling window"""
+        now = time.time() if now is None else now
+        total, counts = self._window_counts(now)
+        result = {
+            "window_seconds": self.window_seconds * self.num_windows,
+            "observations": total,
+            "numeric": {},
+            "categorical": {},
+        }
+
+        for feature in NUMERIC_FEATURES:
+            observed_counts = counts[feature]
+            n = observed_counts.sum()
+            if n == 0:
+                result["numeric"][feature] = {"observations": 0, "psi": None, "ks": None}
+                continue
+            expected = self.expected[feature]
+            observed = observed_counts / n
+            e = np.clip(expected, PSI_EPSILON, None)
+            o = np.clip(observed, PSI_EPSILON, None)
+            psi = float(np.sum((o - e) * np.log(o / e)))
+            ks = float(np.max(np.abs(np.cumsum(observed) - np.cumsum(expected))))
+            result["numeric"][feature] = {
+                "observations": int(n),
+                "psi": round(psi, 4),
+                "ks": round(ks, 4),
+            }
+
+        for feature in CATEGORICAL_FEATURES:
+            observed_counts = counts[feature]
+            n = observed_counts.sum()
+            known = observed_counts[:-1]
+            names = list(self.categories[feature])
+            if n == 0:
+                result["categorical"][feature] = {"observations": 0, "unknown_rate": None, "frequency_delta": {}}
+                continue
+            deltas = known / n - self.expected[feature]
+            result["categorical"][feature] = {
+                "observations": int(n),
+                "unknown_rate": round(float(observed_counts[-1] / n), 4),
+                "frequency_delta": {name: round(float(d), 4) for name, d in zip(names, deltas)},
+            }
+        return result
+
+
+def monitor_from_env():
+    """Build a DriftMonitor from DRIFT_* environment variables, or None if disabled"""
+    if os.getenv("DRIFT_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    reference = load_training_frame(os.getenv("DRIFT_REFERENCE_DATA", "Sleep_health_and_lifestyle_dataset.csv"))
+    return DriftMonitor(
+        reference,
+        window_seconds=float(os.getenv("DRIFT_WINDOW_SECONDS", "300")),
+        num_windows=int(os.getenv("DRIFT_NUM_WINDOWS", "12")),
+    )
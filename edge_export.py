@@ -0,0 +1,165 @@
+"""
+Export the trained tree to a compact, dependency-free format for on-device use.
+
+    python edge_export.py [model.pkl] [output.json]
+
+The export is a small JSON document of parallel integer arrays, one entry
+per tree node (node 0 is the root):
+
+    left, right   child node indices, -1 at leaves
+    feature       index into ``fields``, -1 at leaves
+    threshold     split cut point multiplied by ``scales[feature]``
+    label         index into ``labels`` at leaves, -1 otherwise
+    confidence    leaf confidence in basis points (9512 = 95.12%), 0 otherwise
+
+``fields`` lists the /api/predict field names in the order the model uses
+them and ``categories`` maps each categorical field to its values in code
+order, so a device encodes a categorical input as the value's index. A
+sample goes to the left child when ``value < threshold / scale``, with
+the division done in double precision.
+
+scikit-learn casts inputs to float32 before comparing them with its float64
+thresholds, so its cut point is where float32 rounding crosses the threshold
+(see ``inference.float32_boundaries``), not the threshold itself. Each
+feature's scale is the smallest power of ten that makes all of its
+thresholds whole numbers, and each cut point is rounded up to a multiple of
+``1 / scale``. The comparison then matches the original tree for any input
+given at up to that many decimal places. Finer inputs can only differ when
+they fall between the exact cut point and its rounded-up value.
+
+``EdgeModel`` below is the reference evaluator that on-device ports (see
+section 11 of AndroidIntegration.kt) should reproduce.
+"""
+import json
+import math
+import sys
+
+from inference import MODEL_PATH, REQUEST_FIELDS, float32_boundaries, load_service
+
+# /2: cut points compared with a strict "<" (/1 compared rounded thresholds with "<=")
+FORMAT = "sleep-disorder-tree/2"
+EDGE_MODEL_PATH = "sleep_model_edge.json"
+
+MAX_SCALE_DIGITS = 6
+
+
+def threshold_scale(thresholds):
+    """Smallest power of ten that turns every threshold into an integer"""
+    for digits in range(MAX_SCALE_DIGITS + 1):
+        scale = 10 ** digits
+        # Thresholds are float64 midpoints of float32 training values, e.g. 7.6499998569
+        # between float32(7.6) and float32(7.7), so allow for float32 rounding error
+        if all(abs(t * scale - round(t * scale)) <= max(abs(t * scale), 1.0) * 1e-6 for t in thresholds):
+            return scale
+    return 10 ** MAX_SCALE_DIGITS
+
+
+def export_model(service):
+    """Build the edge export document for a loaded InferenceService"""
+    ev = service.evaluator
+    fields_by_feature = {feature: field for field, feature in REQUEST_FIELDS.items()}
+    fields = [fields_by_feature[name] for name in service.feature_names]
+
+    feature = [int(f) for f in ev.feature]
+    scales = []
+    for index in range(len(fields)):
+        thresholds = [float(ev.threshold[node]) for node, f in enumerate(feature) if f == index]
+        scales.append(threshold_scale(thresholds))
+
+    cuts = float32_boundaries(ev.threshold).tolist()
+    threshold, label, confidence = [], [], []
+    for node, f in enumerate(feature):
+        if ev.children_left[node] == -1:
+            feature[node] = -1
+            prediction = service.leaf_predictions[node]
+            threshold.append(0)
+            label.append(service.target_labels.index(prediction.label))
+            confidence.append(int(round(prediction.confidence * 100)))
+        else:
+            threshold.append(math.ceil(cuts[node] * scales[f]))
+            label.append(-1)
+            confidence.append(0)
+
+    return {
+        "format": FORMAT,
+        "fields": fields,
+        "scales": scales,
+        "categories": {
+            fields_by_feature[column]: list(table)
+            for column, table in service.encoding_tables.items()
+        },
+        "labels": service.target_labels,
+        "left": [int(node) for node in ev.children_left],
+        "right": [int(node) for node in ev.children_right],
+        "feature": feature,
+        "threshold": threshold,
+        "label": label,
+        "confidence": confidence,
+    }
+
+
+def save_export(document, path=EDGE_MODEL_PATH):
+    with open(path, "w") as f:
+        json.dump(document, f, separators=(",", ":"))
+
+
+class EdgeModel:
+    """Reference evaluator for an edge export, in plain Python"""
+
+    def __init__(self, document):
+        if document.get("format") != FORMAT:
+            raise ValueError(f"Unsupported edge model format: {document.get('format')}")
+        self.doc = document
+        self.codes = {
+            field: {value: code for code, value in enumerate(values)}
+            for field, values in document["categories"].items()
+        }
+
+    @classmethod
+    def load(cls, path=EDGE_MODEL_PATH):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def encode(self, request):
+        """Encode a dict of /api/predict fields into the model's feature order"""
+        row = []
+        for field in self.doc["fields"]:
+            value = request[field]
+            codes = self.codes.get(field)
+            if codes is not None:
+                if value not in codes:
+                    raise ValueError(f"Invalid value for {field}: {value}")
+                value = codes[value]
+            row.append(value)
+        return row
+
+    def apply(self, request):
+        """Leaf node index for a dict of /api/predict fields"""
+        doc = self.doc
+        row = self.encode(request)
+        node = 0
+        while doc["left"][node] != -1:
+            f = doc["feature"][node]
+            # Dividing gives the same double as the cut point's decimal, so a value
+            # given exactly at it goes right, as in the original tree
+            if row[f] < doc["threshold"][node] / doc["scales"][f]:
+                node = doc["left"][node]
+            else:
+                node = doc["right"][node]
+        return node
+
+    def predict(self, request):
+        """(label, confidence in percent) for a dict of /api/predict fields"""
+        doc = self.doc
+        node = self.apply(request)
+        return doc["labels"][doc["label"][node]], doc["confidence"][node] / 100
+
+
+if __name__ == "__main__":
+    model_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    output_path = sys.argv[2] if len(sys.argv) > 2 else EDGE_MODEL_PATH
+    document = export_model(load_service(model_path, cache_size=0))
+    save_export(document, output_path)
+    with open(output_path, "rb") as f:
+        size = len(f.read())
+    print(f"✅ Exported {len(document['left'])} nodes to {output_path} ({size} bytes)")
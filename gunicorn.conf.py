@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for serving api.py on several cores
+
+    gunicorn -c gunicorn.conf.py api:app
+
+The master imports the app and loads the model once (preload_app), then
+forks the workers, which share the model's memory copy-on-write. Before
+forking, every object in the master is moved into the garbage collector's
+permanent generation with gc.freeze(), so collections in the workers do not
+write to those pages and un-share them.
+
+Worker count comes from WEB_CONCURRENCY (set by Render/Heroku), defaulting
+to one per CPU core. Rate limits, drift windows, admission counters and cache
+statistics are kept per worker: /api/drift and /api/metrics describe only the
+worker that answered (worker_pid in the response). Usage totals are shared
+through USAGE_DB.
+
+Reloading:
+    kill -HUP <master pid>    restart workers gracefully (same code and model)
+    kill -USR2 <master pid>   start a new master with new code/model, then
+                              send the old master -QUIT once it is serving
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Seconds a worker gets to finish in-flight requests on reload or shutdown
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Optionally recycle workers after this many requests (0 disables)
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+
+
+def when_ready(server):
+    """Load the model in the master, then freeze the heap before any worker forks"""
+    import api
+    import process_stats
+
+    api.load_model_data()
+    gc.collect()
+    gc.freeze()
+    server.log.info("Model preloaded in master %s, memory: %s", os.getpid(), process_stats.memory_usage())
+
+
+def post_fork(server, worker):
+    import process_stats
+
+    process_stats.mark_process_start()
@@ -0,0 +1,532 @@
+"""
+Shared in-process inference for the API and the Streamlit app.
+
+Both front ends load the artifact through ``load_service()`` so they use the
+same encoding tables, the same prediction cache and the same tree evaluator.
+The evaluator walks the fitted tree's node arrays directly instead of going
+through ``DataFrame`` construction and ``model.predict`` on every call; it
+reproduces scikit-learn's float32 comparisons so results are identical.
+
+In compile mode (``INFERENCE_COMPILE=true``) the tree is further flattened
+into a leaf-id table over the intervals defined by its split thresholds, so
+a prediction is one ``searchsorted`` per split feature plus one array index.
+"""
+import os
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+import joblib
+import numpy as np
+import pandas as pd
+
+MODEL_PATH = 'sleepdisordermodel.pkl'
+
+CATEGORICAL_COLUMNS = ['Gender', 'Occupation', 'BMI Category']
+TARGET_COLUMN = 'Sleep Disorder'
+
+# API request field -> model feature name
+REQUEST_FIELDS = {
+    "gender": "Gender",
+    "age": "Age",
+    "occupation": "Occupation",
+    "sleep_duration": "Sleep Duration",
+    "quality_of_sleep": "Quality of Sleep",
+    "physical_activity_level": "Physical Activity Level",
+    "stress_level": "Stress Level",
+    "bmi_category": "BMI Category",
+    "heart_rate": "Heart Rate",
+    "daily_steps": "Daily Steps",
+    "systolic_bp": "SystolicBP",
+    "diastolic_bp": "DiastolicBP",
+}
+
+# Inclusive (min, max) accepted by the API for each numeric request field
+FIELD_RANGES = {
+    "age": (10, 100),
+    "sleep_duration": (0, 12),
+    "quality_of_sleep": (1, 10),
+    "physical_activity_level": (1, 10),
+    "stress_level": (1, 10),
+    "heart_rate": (40, 150),
+    "daily_steps": (0, 50000),
+    "systolic_bp": (90, 200),
+    "diastolic_bp": (60, 130),
+}
+
+# Numeric request fields declared as int in api.PredictionRequest
+INTEGER_FIELDS = [field for field in FIELD_RANGES if field != "sleep_duration"]
+
+# Case-insensitive spellings accepted for categorical fields, as in api.PredictionRequest
+CATEGORY_ALIASES = {
+    "gender": {"male": "Male", "m": "Male", "female": "Female", "f": "Female"},
+    "bmi_category": {
+        "normal": "Normal",
+        "normal weight": "Normal Weight",
+        "overweight": "Overweight",
+        "obese": "Obese",
+    },
+}
+
+# Why a row failed validate_frame(), in order of precedence within a field
+MISSING = "missing"
+NOT_A_NUMBER = "not_a_number"
+NOT_AN_INTEGER = "not_an_integer"
+OUT_OF_RANGE = "out_of_range"
+UNKNOWN_CATEGORY = "unknown_category"
+ERROR_REASONS = [MISSING, NOT_A_NUMBER, NOT_AN_INTEGER, OUT_OF_RANGE, UNKNOWN_CATEGORY]
+
+Prediction = namedtuple('Prediction', ['label', 'confidence', 'probabilities', 'leaf', 'raw_confidence'])
+Explanation = namedtuple('Explanation', ['decision_path', 'top_features'])
+
+
+class ValidatedFrame:
+    """
+    Result of InferenceService.validate_frame()
+
+    ``X`` holds the encoded rows (zeros for invalid rows). ``error_field`` and
+    ``error_reason`` give each row's first error as indices into ``fields``
+    and ``ERROR_REASONS``, or -1 for valid rows.
+    """
+
+    def __init__(self, X, fields, error_field, error_reason):
+        self.X = X
+        self.fields = fields
+        self.error_field = error_field
+        self.error_reason = error_reason
+        self.valid = error_field < 0
+
+    def errors(self):
+        """(row index, {"field", "reason"}) for each invalid row"""
+        rows = np.flatnonzero(~self.valid)
+        return [
+            (row, {"field": self.fields[field], "reason": ERROR_REASONS[reason]})
+            for row, field, reason in zip(
+                rows.tolist(), self.error_field[rows].tolist(), self.error_reason[rows].tolist()
+            )
+        ]
+
+    def error_fields(self):
+        """Fields that caused at least one row to fail"""
+        return [self.fields[i] for i in np.unique(self.error_field[~self.valid]).tolist()]
+
+
+class UnknownCategoryError(ValueError):
+    """Raised when a categorical input is not one of the encoder's classes"""
+
+    def __init__(self, column, value, valid_values):
+        self.column = column
+        self.value = value
+        self.valid_values = list(valid_values)
+        super().__init__(f"Invalid value for {column}. Valid values are: {', '.join(self.valid_values)}")
+
+
+def float32_boundaries(thresholds):
+    """
+    Float64 cut points equivalent to scikit-learn's float32 split test
+
+    scikit-learn goes left when ``float32(x) <= threshold``. For each
+    threshold this returns the smallest float64 ``b`` whose float32 rounding
+    exceeds it, so the same test becomes ``x < b`` on the raw value and no
+    per-value float32 conversion is needed.
+    """
+    t = np.asarray(thresholds, dtype=np.float64)
+    below = t.astype(np.float32)
+    below = np.where(below.astype(np.float64) > t, np.nextafter(below, np.float32(-np.inf)), below)
+    above = np.nextafter(below, np.float32(np.inf))
+    midpoint = (below.astype(np.float64) + above.astype(np.float64)) / 2
+    # Ties round to the float32 with an even mantissa
+    ties_round_up = (above.view(np.uint32) & 1) == 0
+    return np.where(ties_round_up, midpoint, np.nextafter(midpoint, np.inf))
+
+
+class TreeEvaluator:
+    """Evaluates a fitted DecisionTreeClassifier from its node arrays"""
+
+    def __init__(self, model):
+        tree = model.tree_
+        self.children_left = tree.children_left.copy()
+        self.children_right = tree.children_right.copy()
+        self.feature = tree.feature.copy()
+        self.threshold = tree.threshold.copy()
+        self.max_depth = int(tree.max_depth)
+        values = tree.value[:, 0, :]
+        self.proba = values / values.sum(axis=1, keepdims=True)
+        self.leaf_class = self.proba.argmax(axis=1)
+
+        # Python lists make the single-row walk cheaper than NumPy scalar indexing
+        self._left = self.children_left.tolist()
+        self._right = self.children_right.tolist()
+        self._feature = self.feature.tolist()
+        self._boundary = float32_boundaries(self.threshold).tolist()
+
+    def apply_one(self, row):
+        """Leaf id for one encoded row (sequence of floats in feature order)"""
+        left, right, feature, boundary = self._left, self._right, self._feature, self._boundary
+        node = 0
+        while left[node] != -1:
+            if row[feature[node]] < boundary[node]:
+                node = left[node]
+            else:
+                node = right[node]
+        return node
+
+    def apply(self, X):
+        """Leaf ids for a 2-D array of encoded rows"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])
+        node = np.zeros(X.shape[0], dtype=np.intp)
+        for _ in range(self.max_depth):
+            left = self.children_left[node]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(internal, np.where(go_left, left, self.children_right[node]), node)
+        return node
+
+
+class TableBudgetExceeded(ValueError):
+    """Raised when a compiled lookup table would not fit in its memory budget"""
+
+
+class LookupTableEvaluator(TreeEvaluator):
+    """
+    Tree evaluator backed by a dense leaf-id table
+
+    Each split feature is cut into the intervals between its thresholds.
+    The table holds the leaf reached for every combination of intervals, so
+    evaluation needs no traversal. Raises TableBudgetExceeded if the table
+    would need more than ``memory_budget`` bytes.
+    """
+
+    def __init__(self, model, memory_budget=64 * 1024 * 1024):
+        super().__init__(model)
+        internal = self.children_left != -1
+        self.split_features = np.unique(self.feature[internal]).tolist()
+        self.split_thresholds = [
+            np.unique(self.threshold[internal & (self.feature == f)]) for f in self.split_features
+        ]
+        shape = tuple(len(t) + 1 for t in self.split_thresholds)
+        dtype = np.min_scalar_type(len(self.children_left) - 1)
+        size = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        if size > memory_budget:
+            raise TableBudgetExceeded(
+                f"Lookup table needs {size} bytes, over the {memory_budget} byte budget"
+            )
+
+        table = np.zeros(shape, dtype=dtype)
+        axis = {f: i for i, f in enumerate(self.split_features)}
+        stack = [(0, [slice(None)] * len(shape))]
+        while stack:
+            node, box = stack.pop()
+            if self.children_left[node] == -1:
+                table[tuple(box)] = node
+                continue
+            i = axis[self.feature[node]]
+            # Interval k lies left of threshold j exactly when k <= j
+            j = int(np.searchsorted(self.split_thresholds[i], self.threshold[node]))
+            low, high, _ = box[i].indices(shape[i])
+            left_box, right_box = list(box), list(box)
+            left_box[i] = slice(low, min(high, j + 1))
+            right_box[i] = slice(max(low, j + 1), high)
+            stack.append((self.children_left[node], left_box))
+            stack.append((self.children_right[node], right_box))
+
+        self.table = table.ravel()
+        self.table_shape = shape
+        self.table_bytes = size
+        self.strides = np.array([int(np.prod(shape[i + 1:], dtype=np.int64)) for i in range(len(shape))])
+
+        # The number of boundaries <= x is the interval index of x
+        self.split_boundaries = [float32_boundaries(t) for t in self.split_thresholds]
+        self._table = self.table.tolist()
+        self._splits = list(zip(self.split_features, [b.tolist() for b in self.split_boundaries], self.strides.tolist()))
+
+    def apply_one(self, row):
+        index = 0
+        for feature, boundaries, stride in self._splits:
+            index += bisect_right(boundaries, row[feature]) * stride
+        return self._table[index]
+
+    def apply(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        index = np.zeros(X.shape[0], dtype=np.int64)
+        for feature, boundaries, stride in zip(self.split_features, self.split_boundaries, self.strides):
+            index += np.searchsorted(boundaries, X[:, feature], side='right') * stride
+        return self.table[index].astype(np.intp)
+
+
+def build_evaluator(model, compile=False, memory_budget=64 * 1024 * 1024):
+    """Lookup-table evaluator when compiling and it fits the budget, tree traversal otherwise"""
+    if compile:
+        try:
+            return LookupTableEvaluator(model, memory_budget)
+        except TableBudgetExceeded as e:
+            print(f"⚠️ Warning: {str(e)}. Falling back to tree traversal.")
+    return TreeEvaluator(model)
+
+
+class InferenceService:
+    """Encoding, cached prediction and batch prediction over one loaded artifact"""
+
+    def __init__(self, model_data, cache_size=4096, compile=False, memory_budget=64 * 1024 * 1024):
+        self.model_data = model_data
+        self.model = model_data['model']
+        self.label_encoders = model_data['label_encoders']
+        self.feature_names = list(model_data['feature_names'])
+        self.evaluator = build_evaluator(self.model, compile, memory_budget)
+
+        # value -> code lookups, built once instead of LabelEncoder.transform per call
+        self.encoding_tables = {
+            col: {value: code for code, value in enumerate(self.label_encoders[col].classes_.tolist())}
+            for col in CATEGORICAL_COLUMNS
+        }
+        self.target_labels = self.label_encoders[TARGET_COLUMN].inverse_transform(self.model.classes_).tolist()
+        self._categorical_positions = [
+            (i, self.encoding_tables[col], col) for i, col in enumerate(self.feature_names) if col in self.encoding_tables
+        ]
+        self._predict_cached = lru_cache(maxsize=cache_size)(self._predict_key)
+
+        # Top-class probability -> calibrated confidence map (see sleep_disorder_train.py);
+        # older artifacts have none and report the raw probability
+        self.calibration = model_data.get('calibration')
+
+        # Every leaf's prediction and explanation is fixed, so build them once
+        self.leaf_predictions = {}
+        self.leaf_explanations = {}
+        self._build_leaf_tables()
+
+    def _condition(self, node, went_left):
+        """Readable split condition for one step of a decision path"""
+        column = self.feature_names[self.evaluator.feature[node]]
+        threshold = self.evaluator.threshold[node]
+        table = self.encoding_tables.get(column)
+        if table is not None:
+            matching = [value for value, code in table.items() if (code <= threshold) == went_left]
+            return f"{column} in {{{', '.join(matching)}}}"
+        return f"{column} {'<=' if went_left else '>'} {threshold:g}"
+
+    def calibrate_confidence(self, raw):
+        """Calibrated confidence (0-1) for an array of top-class probabilities"""
+        raw = np.asarray(raw, dtype=np.float64)
+        if self.calibration is None:
+            return raw
+        return np.interp(raw, self.calibration['x'], self.calibration['y'])
+
+    def _build_leaf_tables(self):
+        ev = self.evaluator
+        # Calibrated once per node, so serving applies calibration with a leaf lookup
+        confidence = self.calibrate_confidence(ev.proba.max(axis=1)) * 100
+        stack = [(0, [])]
+        while stack:
+            node, path = stack.pop()
+            if ev.children_left[node] != -1:
+                stack.append((ev.children_left[node], path + [(node, True)]))
+                stack.append((ev.children_right[node], path + [(node, False)]))
+                continue
+
+            leaf_class = ev.leaf_class[node]
+            proba = ev.proba[node]
+            self.leaf_predictions[node] = Prediction(
+                label=self.target_labels[leaf_class],
+                confidence=float(confidence[node]),
+                probabilities=dict(zip(self.target_labels, proba.tolist())),
+                leaf=int(node),
+                raw_confidence=float(proba.max()) * 100,
+            )
+
+            # Each split's contribution is the change it made to the predicted
+            # class probability, in percentage points, summed per feature
+            contributions = {}
+            for parent, went_left in path:
+                child = ev.children_left[parent] if went_left else ev.children_right[parent]
+                column = self.feature_names[ev.feature[parent]]
+                delta = (ev.proba[child, leaf_class] - ev.proba[parent, leaf_class]) * 100
+                contributions[column] = contributions.get(column, 0.0) + float(delta)
+            self.leaf_explanations[node] = Explanation(
+                decision_path=[self._condition(parent, went_left) for parent, went_left in path],
+                top_features=sorted(contributions.items(), key=lambda item: -abs(item[1])),
+            )
+
+    def options(self, column):
+        """Valid values for a categorical column"""
+        return list(self.encoding_tables[column])
+
+    def encode(self, inputs):
+        """Encode a dict of feature name -> raw value into a row in feature order"""
+        row = [inputs[name] for name in self.feature_names]
+        for i, table, col in self._categorical_positions:
+            code = table.get(row[i])
+            if code is None:
+                raise UnknownCategoryError(col, row[i], table)
+            row[i] = code
+        return row
+
+    def _predict_key(self, row):
+        return self.leaf_predictions[self.evaluator.apply_one(row)]
+
+    def predict_one(self, inputs):
+        """Predict for a dict of feature name -> raw value; raises UnknownCategoryError"""
+        return self.predict_row(self.encode(inputs))
+
+    def predict_row(self, row):
+        """Predict for one row returned by encode() (cached)"""
+        return self._predict_cached(tuple(row))
+
+    def allowed_values(self, field):
+        """Valid values of a categorical request field, or its {"min", "max"} range"""
+        feature = REQUEST_FIELDS[field]
+        if feature in self.encoding_tables:
+            return list(self.encoding_tables[feature])
+        low, high = FIELD_RANGES[field]
+        return {"min": low, "max": high}
+
+    def validate_frame(self, frame):
+        """
+        Validate and encode a DataFrame of API request fields, one column at a time
+
+        Applies the same rules as api.PredictionRequest (ranges, integer
+        fields, case-insensitive gender and BMI category) plus the encoders'
+        known categories, without raising per row. Returns a ValidatedFrame.
+        """
+        n = len(frame)
+        fields_by_feature = {feature: field for field, feature in REQUEST_FIELDS.items()}
+        fields = [fields_by_feature[feature] for feature in self.feature_names]
+        X = np.zeros((n, len(fields)), dtype=np.float64)
+        error_field = np.full(n, -1, dtype=np.int8)
+        error_reason = np.full(n, -1, dtype=np.int8)
+
+        def fail(mask, i, reason):
+            # Keep only each row's first error
+            mask = mask & (error_field < 0)
+            error_field[mask] = i
+            error_reason[mask] = ERROR_REASONS.index(reason)
+            return mask
+
+        for i, (field, feature) in enumerate(zip(fields, self.feature_names)):
+            if field not in frame:
+                fail(np.ones(n, dtype=bool), i, MISSING)
+                continue
+            column = frame[field]
+            missing = column.isna().to_numpy()
+            fail(missing, i, MISSING)
+
+            table = self.encoding_tables.get(feature)
+            if table is not None:
+                aliases = CATEGORY_ALIASES.get(field)
+                if aliases is not None:
+                    column = column.astype(object)
+                    column = column.where(column.map(type) == str).str.lower().map(aliases)
+                values = column.map(table).to_numpy(dtype=np.float64, na_value=np.nan)
+                bad = np.isnan(values)
+                fail(bad & ~missing, i, UNKNOWN_CATEGORY)
+            else:
+                values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+                bad = np.isnan(values)
+                fail(bad & ~missing, i, NOT_A_NUMBER)
+                with np.errstate(invalid='ignore'):
+                    if field in INTEGER_FIELDS:
+                        fractional = ~bad & (values != np.floor(values))
+                        fail(fractional, i, NOT_AN_INTEGER)
+                        bad |= fractional
+                    low, high = FIELD_RANGES[field]
+                    outside = ~bad & ((values < low) | (values > high))
+                fail(outside, i, OUT_OF_RANGE)
+                bad |= outside
+            X[:, i] = np.where(bad, 0, values)
+
+        X[error_field >= 0] = 0
+        return ValidatedFrame(X, fields, error_field, error_reason)
+
+    def feature_dicts(self, X):
+        """Raw feature-name dicts for encoded rows, as request_features() builds them"""
+        fields_by_feature = {feature: field for field, feature in REQUEST_FIELDS.items()}
+        columns = []
+        for i, feature in enumerate(self.feature_names):
+            values = X[:, i]
+            if feature in self.encoding_tables or fields_by_feature[feature] in INTEGER_FIELDS:
+                values = values.astype(np.int64)
+            if feature in self.encoding_tables:
+                classes = self.label_encoders[feature].classes_.tolist()
+                columns.append([classes[v] for v in values.tolist()])
+            else:
+                columns.append(values.tolist())
+        return [dict(zip(self.feature_names, row)) for row in zip(*columns)]
+
+    def feature_frame(self, frame, validated):
+        """
+        Raw feature values of a validated request frame, columns named by model feature
+
+        Numeric values are kept for valid rows only (NaN otherwise). Categorical
+        values are kept for every row, normalized through CATEGORY_ALIASES
+        where they match one, so unknown categories in rejected rows still show up.
+        """
+        columns = {}
+        for i, (field, feature) in enumerate(zip(validated.fields, self.feature_names)):
+            if feature not in self.encoding_tables:
+                columns[feature] = np.where(validated.valid, validated.X[:, i], np.nan)
+                continue
+            if field not in frame:
+                columns[feature] = np.full(len(frame), None, dtype=object)
+                continue
+            column = frame[field].astype(object)
+            aliases = CATEGORY_ALIASES.get(field)
+            if aliases is not None:
+                normalized = column.where(column.map(type) == str).str.lower().map(aliases)
+                column = normalized.where(normalized.notna(), column)
+            columns[feature] = column.to_numpy()
+        return pd.DataFrame(columns)
+
+    def predict_rows(self, rows):
+        """Predictions for a list or array of encoded rows, evaluated in one vectorized pass"""
+        if len(rows) == 0:
+            return []
+        leaves = self.evaluator.apply(np.asarray(rows, dtype=float))
+        return [self.leaf_predictions[leaf] for leaf in leaves.tolist()]
+
+    def explain(self, prediction):
+        """Decision path and per-feature contributions behind a prediction"""
+        return self.leaf_explanations[prediction.leaf]
+
+    def predict_encoded(self, X):
+        """Class indices and probabilities for a 2-D array of encoded rows"""
+        leaves = self.evaluator.apply(X)
+        return self.evaluator.leaf_class[leaves], self.evaluator.proba[leaves]
+
+    def sensitivity_curves(self, inputs, grids):
+        """
+        Class probabilities as each feature sweeps its grid, others held at ``inputs``
+
+        ``grids`` maps feature name -> sequence of values. Every curve is
+        evaluated in a single batch. Returns feature -> (values, probabilities)
+        with one probability column per entry of ``target_labels``.
+        """
+        base = np.asarray(self.encode(inputs), dtype=float)
+        grids = {feature: np.asarray(values, dtype=float) for feature, values in grids.items()}
+        X = np.tile(base, (sum(len(values) for values in grids.values()), 1))
+        offset = 0
+        for feature, values in grids.items():
+            X[offset:offset + len(values), self.feature_names.index(feature)] = values
+            offset += len(values)
+
+        _, proba = self.predict_encoded(X)
+        curves = {}
+        offset = 0
+        for feature, values in grids.items():
+            curves[feature] = (values, proba[offset:offset + len(values)])
+            offset += len(values)
+        return curves
+
+    def cache_info(self):
+        return self._predict_cached.cache_info()._asdict()
+
+
+def load_service(path=MODEL_PATH, cache_size=None, compile=None):
+    """Load a model artifact and wrap it in an InferenceService"""
+    if cache_size is None:
+        cache_size = int(os.getenv("INFERENCE_CACHE_SIZE", "4096"))
+    if compile is None:
+        compile = os.getenv("INFERENCE_COMPILE", "false").lower() in ("1", "true", "yes")
+    memory_budget = int(float(os.getenv("INFERENCE_TABLE_BUDGET_MB", "64")) * 1024 * 1024)
+    return InferenceService(joblib.load(path), cache_size=cache_size, compile=compile, memory_budget=memory_budget)
@@ -0,0 +1,323 @@
+"""
+Background scoring jobs for batches too large for one HTTP request.
+
+A submitted batch is written to disk and recorded in a SQLite job store.
+A small worker pool scores it chunk by chunk, storing each chunk's results
+as it goes, so progress can be polled and results downloaded while the job
+runs. Jobs are claimed with a lease: if the process running a job dies, its
+lease expires and another worker (or the restarted process) resumes the job
+from its last completed chunk. Finished jobs, with their inputs and results,
+are deleted once they are older than the retention period. Each job records
+the API caller that submitted it, so scored rows are billed to that tenant
+and only that tenant can read the job.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from inference import REQUEST_FIELDS
+from usage import Caller
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobStore:
+    """SQLite-backed job metadata and chunked results, plus input files on disk"""
+
+    def __init__(self, directory="jobs"):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "inputs"), exist_ok=True)
+        self.path = os.path.join(directory, "jobs.sqlite")
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT, chunk_size INTEGER, total INTEGER, "
+                "processed INTEGER, chunks INTEGER, owner TEXT, created REAL, updated REAL, error TEXT, "
+                "tenant TEXT, client TEXT)"
+            )
+            # Stores created before jobs recorded their caller
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column in ("tenant", "client"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "job_id TEXT, chunk INTEGER, start INTEGER, data TEXT, PRIMARY KEY (job_id, chunk))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def input_path(self, job_id):
+        return os.path.join(self.directory, "inputs", f"{job_id}.csv")
+
+    def create(self, job_id, chunk_size, total=None, caller=None):
+        """Register a new job; its input must already be at input_path(job_id)"""
+        now = time.time()
+        tenant, client = caller if caller is not None else (None, None)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, 0, 0, NULL, ?, ?, NULL, ?, ?)",
+                (job_id, QUEUED, chunk_size, total, now, now, tenant, client),
+            )
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def claim(self, owner, lease_seconds):
+        """Atomically take the oldest queued job, or a running job whose lease expired"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND updated < ?) "
+                "ORDER BY created LIMIT 1",
+                (QUEUED, RUNNING, now - lease_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, updated = ? "
+                "WHERE id = ? AND (status = ? OR (status = ? AND updated < ?))",
+                (RUNNING, owner, now, row[0], QUEUED, RUNNING, now - lease_seconds),
+            ).rowcount
+        return self.get(row[0]) if claimed else None
+
+    def save_chunk(self, job_id, owner, chunk, start, results, total=None):
+        """Store one chunk's results and advance progress; False if the lease was lost"""
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET processed = ?, chunks = ?, total = COALESCE(?, total), updated = ? "
+                "WHERE id = ? AND owner = ? AND status = ?",
+                (start + len(results), chunk + 1, total, time.time(), job_id, owner, RUNNING),
+            ).rowcount
+            if updated:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                    (job_id, chunk, start, json.dumps(results)),
+                )
+        return bool(updated)
+
+    def finish(self, job_id, owner, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ? AND owner = ?",
+                (FAILED if error else COMPLETED, error, time.time(), job_id, owner),
+            )
+
+    def delete_finished(self, before):
+        """Delete jobs that finished before a timestamp, with their results and input files"""
+        with self._connect() as conn:
+            job_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND updated < ?", (COMPLETED, FAILED, before)
+            )]
+            conn.executemany("DELETE FROM results WHERE job_id = ?", [(job_id,) for job_id in job_ids])
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+        for job_id in job_ids:
+            try:
+                os.remove(self.input_path(job_id))
+            except FileNotFoundError:
+                pass
+        return len(job_ids)
+
+    def results(self, job_id, chunk):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT start, data FROM results WHERE job_id = ? AND chunk = ?", (job_id, chunk)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"start": row[0], "results": json.loads(row[1])}
+
+
+def count_rows(fileobj, chunk_size=100000):
+    """
+    CSV records in a binary file object after the header, leaving it rewound
+
+    Parsed with the same reader that scores the job, so quoted newlines and
+    blank lines count the way the job will see them. Only the first column is
+    kept, in chunks, so memory stays bounded for large uploads.
+    """
+    fileobj.seek(0)
+    try:
+        rows = sum(len(chunk) for chunk in pd.read_csv(fileobj, chunksize=chunk_size, usecols=[0]))
+    except pd.errors.EmptyDataError:
+        rows = 0
+    fileobj.seek(0)
+    return rows
+
+
+def score_chunk(service, frame, start):
+    """Score a DataFrame of request fields in one vectorized pass"""
+    validated = service.validate_frame(frame)
+    results = [None] * len(frame)
+    for row, error in validated.errors():
+        results[row] = {"index": start + row, "success": False, "error": error}
+    rows = np.flatnonzero(validated.valid)
+    for row, result in zip(rows.tolist(), service.predict_rows(validated.X[rows])):
+        results[row] = {
+            "index": start + row,
+            "success": True,
+            "prediction": result.label,
+            "confidence": round(result.confidence, 2),
+        }
+    return results
+
+
+class JobRunner:
+    """
+    Scores queued jobs on a small thread pool
+
+    ``get_service`` returns the current InferenceService. ``record_rows``, if
+    given, is called as ``record_rows(caller, rows)`` with the rows scored
+    successfully in each stored chunk of a job submitted by an API caller, to
+    bill them like /api/predict/batch rows. Workers pause for
+    ``chunk_pause`` seconds between chunks so long jobs do not crowd out
+    interactive requests in the same process. Jobs that finished more than
+    ``retention_seconds`` ago are deleted, checked every ``cleanup_interval``.
+    """
+
+    def __init__(self, store, get_service, workers=1, chunk_size=10000, chunk_pause=0.01,
+                 lease_seconds=60, poll_interval=1.0, retention_seconds=86400, cleanup_interval=300,
+                 record_rows=None):
+        self.store = store
+        self.get_service = get_service
+        self.record_rows = record_rows
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.cleanup_interval = cleanup_interval
+        self._next_cleanup = 0.0
+        self._cleanup_lock = threading.Lock()
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._pool = None
+
+    def start(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-worker")
+        for _ in range(self.workers):
+            self._pool.submit(self._worker)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def submit_records(self, records, caller=None):
+        """Queue a list of request dicts as a new job, billed to ``caller`` if given"""
+        job_id = uuid.uuid4().hex
+        # Explicit columns keep one row per record, even for empty objects
+        frame = pd.DataFrame.from_records(records, columns=list(REQUEST_FIELDS))
+        frame.to_csv(self.store.input_path(job_id), index=False)
+        self.store.create(job_id, self.chunk_size, total=len(frame), caller=caller)
+        self._wake.set()
+        return job_id
+
+    def submit_file(self, fileobj, caller=None, total=None):
+        """Queue an uploaded CSV file (header row of request fields) as a new job, billed to ``caller`` if given"""
+        job_id = uuid.uuid4().hex
+        with open(self.store.input_path(job_id), "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+        self.store.create(job_id, self.chunk_size, total=total, caller=caller)
+        self._wake.set()
+        return job_id
+
+    def cleanup(self):
+        """Delete expired jobs, at most once per cleanup_interval across this runner's workers"""
+        with self._cleanup_lock:
+            now = time.time()
+            if now < self._next_cleanup:
+                return 0
+            self._next_cleanup = now + self.cleanup_interval
+        return self.store.delete_finished(now - self.retention_seconds)
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                self.cleanup()
+                job = self.store.claim(self.owner, self.lease_seconds)
+            except Exception as e:
+                # e.g. the store is locked or the disk is full; keep the worker alive and retry
+                print(f"❌ Error polling job store: {str(e)}")
+                self._stop.wait(self.poll_interval)
+                continue
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                try:
+                    self.store.finish(job["id"], self.owner, error=str(e))
+                except Exception as store_error:
+                    # The lease expires and the job is retried
+                    print(f"❌ Error recording failure of job {job['id']}: {str(store_error)}")
+
+    def _run(self, job):
+        job_id, chunk_size = job["id"], job["chunk_size"]
+        path = self.store.input_path(job_id)
+        total = job["total"]
+        if total is None:
+            with open(path, "rb") as f:
+                total = count_rows(f)
+        caller = Caller(job["tenant"], job["client"]) if job["tenant"] is not None else None
+
+        # Resume after the last chunk whose results were stored
+        first_chunk = job["chunks"]
+        reader = pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, first_chunk * chunk_size + 1))
+        for chunk, frame in enumerate(reader, start=first_chunk):
+            if self._stop.is_set():
+                # Leave the job running; its lease expires and it is resumed later
+                return
+            start = chunk * chunk_size
+            results = score_chunk(self.get_service(), frame, start)
+            if not self.store.save_chunk(job_id, self.owner, chunk, start, results, total):
+                return  # another worker took over this job
+            if caller is not None and self.record_rows is not None:
+                self.record_rows(caller, sum(1 for result in results if result["success"]))
+            time.sleep(self.chunk_pause)
+        self.store.finish(job_id, self.owner)
+
+
+def runner_from_env(get_service, record_rows=None):
+    """Build a JobRunner from JOB_* environment variables, or None if disabled"""
+    if os.getenv("JOBS_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return JobRunner(
+        JobStore(os.getenv("JOB_STORE_DIR", "jobs")),
+        get_service,
+        workers=int(os.getenv("JOB_WORKERS", "1")),
+        chunk_size=int(os.getenv("JOB_CHUNK_SIZE", "10000")),
+        chunk_pause=float(os.getenv("JOB_CHUNK_PAUSE", "0.01")),
+        lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+        retention_seconds=float(os.getenv("JOB_RETENTION_SECONDS", "86400")),
+        record_rows=record_rows,
+    )
@@ -0,0 +1,246 @@
+"""
+Append-only prediction log for drift analysis and retraining.
+
+Records are pushed onto a bounded in-memory queue from the request path and
+written by a background thread in batches to local segment files (SQLite by
+default, Parquet when pyarrow is installed). Segments are rotated after a
+fixed number of rows. When the queue is full the record is dropped and
+counted, so logging never blocks a request.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+    pq = None
+
+COLUMNS = ["ts", "endpoint", "model_version", "inputs", "prediction", "confidence", "latency_ms"]
+
+_STOP = object()
+
+
+class SQLiteSegmentWriter:
+    """Writes log batches into rotating SQLite files"""
+
+    suffix = ".sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "ts REAL, endpoint TEXT, model_version TEXT, inputs TEXT, "
+            "prediction TEXT, confidence REAL, latency_ms REAL)"
+        )
+        self.conn.commit()
+
+    def write(self, rows):
+        self.conn.executemany(
+            "INSERT INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [tuple(row[col] for col in COLUMNS) for row in rows],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class ParquetSegmentWriter:
+    """Writes log batches as row groups of a Parquet file"""
+
+    suffix = ".parquet"
+
+    def __init__(self, path):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for Parquet prediction logs")
+        self.path = path
+        self.schema = pa.schema([
+            ("ts", pa.float64()),
+            ("endpoint", pa.string()),
+            ("model_version", pa.string()),
+            ("inputs", pa.string()),
+            ("prediction", pa.string()),
+            ("confidence", pa.float64()),
+            ("latency_ms", pa.float64()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        table = pa.Table.from_pydict(
+            {col: [row[col] for row in rows] for col in COLUMNS},
+            schema=self.schema,
+        )
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+SEGMENT_WRITERS = {
+    "sqlite": SQLiteSegmentWriter,
+    "parquet": ParquetSegmentWriter,
+}
+
+
+class PredictionLogger:
+    """
+    Non-blocking prediction logger backed by a background writer thread
+
+    Call ``log()`` from the request path; it never waits. Call ``start()``
+    once at startup and ``stop()`` at shutdown to flush remaining records.
+    """
+
+    def __init__(self, directory="prediction_logs", fmt="sqlite", queue_size=10000,
+                 batch_size=500, flush_interval=1.0, segment_max_rows=100000):
+        if fmt not in SEGMENT_WRITERS:
+            raise ValueError(f"Unknown prediction log format: {fmt}. Use one of: {', '.join(SEGMENT_WRITERS)}")
+        self.directory = directory
+        self.writer_cls = SEGMENT_WRITERS[fmt]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_max_rows = segment_max_rows
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._segment = None
+        self._segment_rows = 0
+        self._segment_seq = 0
+        self._lock = threading.Lock()
+
+        self.logged = 0
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        if self._thread is None:
+            return
+        # The sentinel must get through even if the queue is full
+        while True:
+            try:
+                self._queue.put(_STOP, timeout=0.1)
+                break
+            except queue.Full:
+                if not self._thread.is_alive():
+                    break
+        self._thread.join(timeout)
+        self._thread = None
+
+    def log(self, endpoint, model_version, inputs, prediction, confidence, latency_ms):
+        """Queue a record for writing; drops and counts it if the queue is full"""
+        record = {
+            "ts": time.time(),
+            "endpoint": endpoint,
+            "model_version": model_version,
+            "inputs": json.dumps(inputs, default=str),
+            "prediction": prediction,
+            "confidence": confidence,
+            "latency_ms": latency_ms,
+        }
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.logged += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "logged": self.logged,
+                "dropped": self.dropped,
+                "written": self.written,
+                "write_errors": self.write_errors,
+                "queued": self._queue.qsize(),
+                "segment": self._segment.path if self._segment else None,
+            }
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+        while not stopping:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+        # Drain anything queued behind the sentinel
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        if batch:
+            self._flush(batch)
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def _flush(self, batch):
+        try:
+            while batch:
+                if self._segment is None or self._segment_rows >= self.segment_max_rows:
+                    self._rotate()
+                room = self.segment_max_rows - self._segment_rows
+                chunk, batch = batch[:room], batch[room:]
+                self._segment.write(chunk)
+                self._segment_rows += len(chunk)
+                with self._lock:
+                    self.written += len(chunk)
+        except Exception as e:
+            with self._lock:
+                self.write_errors += 1
+            print(f"❌ Prediction log write failed: {str(e)}")
+
+    def _rotate(self):
+        if self._segment is not None:
+            self._segment.close()
+        self._segment_seq += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        filename = f"predictions-{stamp}-{os.getpid()}-{self._segment_seq:04d}{self.writer_cls.suffix}"
+        self._segment = self.writer_cls(os.path.join(self.directory, filename))
+        self._segment_rows = 0
+
+
+def logger_from_env():
+    """Build a PredictionLogger from PREDICTION_LOG_* environment variables, or None if disabled"""
+    if os.getenv("PREDICTION_LOG_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return PredictionLogger(
+        directory=os.getenv("PREDICTION_LOG_DIR", "prediction_logs"),
+        fmt=os.getenv("PREDICTION_LOG_FORMAT", "sqlite"),
+        queue_size=int(os.getenv("PREDICTION_LOG_QUEUE_SIZE", "10000")),
+        batch_size=int(os.getenv("PREDICTION_LOG_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("PREDICTION_LOG_FLUSH_INTERVAL", "1.0")),
+        segment_max_rows=int(os.getenv("PREDICTION_LOG_SEGMENT_ROWS", "100000")),
+    )
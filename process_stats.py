@@ -0,0 +1,56 @@
+"""
+Per-process startup time and memory figures for multi-worker deployments.
+
+Workers forked from a preloading master share the model's pages until they
+write to them, so RSS alone overstates their cost. PSS (shared pages split
+between the processes using them) and USS (pages private to this process)
+show what each worker really adds.
+"""
+import os
+import resource
+import time
+
+_started_at = time.time()
+_ready_at = None
+
+
+def mark_process_start():
+    """Restart the startup clock; call right after fork in each worker"""
+    global _started_at, _ready_at
+    _started_at = time.time()
+    _ready_at = None
+
+
+def mark_ready():
+    """Record that this process has finished starting up"""
+    global _ready_at
+    _ready_at = time.time()
+
+
+def memory_usage():
+    """RSS, PSS and USS of this process in kB (PSS/USS only where /proc is available)"""
+    try:
+        fields = {}
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+        return {
+            "rss_kb": fields["Rss"],
+            "pss_kb": fields["Pss"],
+            "uss_kb": fields["Private_Clean"] + fields["Private_Dirty"],
+            "shared_kb": fields["Shared_Clean"] + fields["Shared_Dirty"],
+        }
+    except (OSError, KeyError):
+        # ru_maxrss is peak RSS, in kB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"max_rss_kb": peak // 1024 if os.uname().sysname == "Darwin" else peak}
+
+
+def snapshot():
+    return {
+        "pid": os.getpid(),
+        "startup_seconds": round(_ready_at - _started_at, 3) if _ready_at else None,
+        "memory": memory_usage(),
+    }
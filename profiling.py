@@ -0,0 +1,176 @@
+"""
+Opt-in request tracing and on-demand CPU profiling.
+
+``span(name)`` times a block of work inside the current request. Spans are
+only collected for requests that are being traced (a client sent the
+``X-Server-Timing`` header, or an exporter is configured), so untraced
+requests pay one context-variable lookup per span. Collected spans can be
+returned to the client as a ``Server-Timing`` header and exported to an
+OpenTelemetry collector or a JSON-lines file.
+"""
+import cProfile
+import contextvars
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+except ImportError:  # OpenTelemetry export is optional
+    otel_trace = None
+
+# Sort keys accepted by pstats.Stats.sort_stats
+SORT_KEYS = frozenset(pstats.Stats.sort_arg_dict_default)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class RequestTrace:
+    """Spans recorded for one request, as (name, start, duration) in perf_counter seconds"""
+
+    def __init__(self, name):
+        self.name = name
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.end = None
+
+    def server_timing(self):
+        """Server-Timing header value with durations in milliseconds"""
+        parts = [f"{name};dur={duration * 1000:.3f}" for name, _, duration in self.spans]
+        if self.end is not None:
+            parts.append(f"total;dur={(self.end - self.start) * 1000:.3f}")
+        return ", ".join(parts)
+
+
+def start_trace(name):
+    """Begin collecting spans for the current request; pass the token to end_trace"""
+    trace = RequestTrace(name)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(trace, token):
+    trace.end = time.perf_counter()
+    _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name):
+    """Time a block of work within the current traced request (no-op otherwise)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans.append((name, start, time.perf_counter() - start))
+
+
+def add_span(name, start, end):
+    """Record a span measured elsewhere (perf_counter timestamps)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.spans.append((name, start, end - start))
+
+
+class FileExporter:
+    """Appends one JSON line per traced request to a local file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1024 * 1024)
+
+    def export(self, trace):
+        record = {
+            "name": trace.name,
+            "start": trace.wall_start,
+            "duration_ms": round((trace.end - trace.start) * 1000, 3),
+            "spans": [
+                {"name": name, "offset_ms": round((start - trace.start) * 1000, 3), "duration_ms": round(duration * 1000, 3)}
+                for name, start, duration in trace.spans
+            ],
+        }
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class OpenTelemetryExporter:
+    """Re-emits each traced request as an OpenTelemetry span tree through an OTLP exporter"""
+
+    def __init__(self, service_name):
+        if otel_trace is None:
+            raise RuntimeError("opentelemetry-sdk is required for TRACE_EXPORTER=otlp")
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        # Endpoint comes from OTEL_EXPORTER_OTLP_ENDPOINT (default http://localhost:4318)
+        self.provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        self.provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        self.tracer = self.provider.get_tracer("sleep-disorder-api")
+
+    def export(self, trace):
+        def to_ns(perf_time):
+            return int((trace.wall_start + perf_time - trace.start) * 1e9)
+
+        root = self.tracer.start_span(trace.name, start_time=to_ns(trace.start))
+        context = otel_trace.set_span_in_context(root)
+        for name, start, duration in trace.spans:
+            child = self.tracer.start_span(name, context=context, start_time=to_ns(start))
+            child.end(end_time=to_ns(start + duration))
+        root.end(end_time=to_ns(trace.end))
+
+    def close(self):
+        self.provider.shutdown()
+
+
+def exporter_from_env():
+    """Build the exporter selected by TRACE_EXPORTER (file or otlp), or None"""
+    kind = os.getenv("TRACE_EXPORTER", "").lower()
+    if kind == "file":
+        # One file per process: workers buffer their writes, so a shared file would interleave lines
+        return FileExporter(os.getenv("TRACE_FILE") or f"traces-{os.getpid()}.jsonl")
+    if kind == "otlp":
+        return OpenTelemetryExporter(os.getenv("OTEL_SERVICE_NAME", "sleep-disorder-api"))
+    return None
+
+
+class CPUProfiler:
+    """Captures one cProfile run at a time over live traffic"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start profiling, or return None if a capture is already running"""
+        if not self._lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile, sort="cumulative", limit=40):
+        """Stop profiling and return the pstats report as text"""
+        try:
+            profile.disable()
+        finally:
+            self._lock.release()
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
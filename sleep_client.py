@@ -0,0 +1,231 @@
+"""
+Python client for the Sleep Disorder Prediction API.
+
+    from sleep_client import SleepDisorderClient
+
+    with SleepDisorderClient("https://your-api.onrender.com") as client:
+        client.predict({...})                # one /api/predict call
+        client.predict_many(rows)            # any number of rows via /api/predict/batch
+
+Pass ``api_key=`` when the server requires an X-API-Key.
+``AsyncSleepDisorderClient`` has the same methods as coroutines. Both keep a
+pool of keep-alive connections, split large lists into batch calls that run
+with bounded parallelism, retry 429/503 responses (honouring Retry-After)
+and connection errors with exponential backoff, and cache /api/options for
+``options_ttl`` seconds.
+
+To talk to the app in-process (tests, notebooks), pass
+``http_client=fastapi.testclient.TestClient(api.app)`` to the sync client or
+``transport=httpx.ASGITransport(api.app)`` to the async one.
+"""
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+RETRY_STATUS_CODES = (429, 503)
+
+
+class APIError(Exception):
+    """Raised for an error response that was not (or no longer) retried"""
+
+    def __init__(self, status_code, detail):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(f"{status_code}: {detail}")
+
+
+class _ClientBase:
+    def __init__(self, base_url, timeout, max_connections, max_retries, backoff, max_backoff,
+                 batch_size, max_parallel, options_ttl, api_key):
+        self.base_url = base_url.rstrip("/")
+        # Sent with every request; identifies the tenant when the server sets API_KEYS
+        self._auth_headers = {"X-API-Key": api_key} if api_key else None
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+        self.max_parallel = max_parallel
+        self.options_ttl = options_ttl
+        self._options = None
+        self._options_expires = 0.0
+
+    def _retry_delay(self, attempt, response=None):
+        """Seconds to wait before retry number ``attempt`` (0-based)"""
+        if response is not None:
+            retry_after = response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff * 2 ** attempt, self.max_backoff))
+
+    def _should_retry(self, attempt, response):
+        return attempt < self.max_retries and response.status_code in RETRY_STATUS_CODES
+
+    @staticmethod
+    def _result(response):
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise APIError(response.status_code, detail)
+        return response.json()
+
+    def _cached_options(self):
+        if self._options is not None and time.monotonic() < self._options_expires:
+            return self._options
+        return None
+
+    def _store_options(self, options):
+        self._options = options
+        self._options_expires = time.monotonic() + self.options_ttl
+        return options
+
+    def _chunks(self, requests):
+        return [(start, requests[start:start + self.batch_size]) for start in range(0, len(requests), self.batch_size)]
+
+    @staticmethod
+    def _merge(total, chunk_results):
+        """Combine batch responses, with row indices relative to the full list"""
+        predictions, allowed = [], {}
+        for start, body in chunk_results:
+            for prediction in body["predictions"]:
+                prediction["index"] += start
+                predictions.append(prediction)
+            allowed.update(body.get("allowed", {}))
+        merged = {"predictions": predictions, "total": total}
+        if allowed:
+            merged["allowed"] = allowed
+        return merged
+
+
+class SleepDisorderClient(_ClientBase):
+    """Synchronous client; batch chunks are sent from a small thread pool"""
+
+    def __init__(self, base_url="http://localhost:8000", timeout=10.0, max_connections=10, max_retries=3,
+                 backoff=0.5, max_backoff=10.0, batch_size=1000, max_parallel=4, options_ttl=300.0,
+                 api_key=None, headers=None, http_client=None):
+        super().__init__(base_url, timeout, max_connections, max_retries, backoff, max_backoff,
+                         batch_size, max_parallel, options_ttl, api_key)
+        self._owns_client = http_client is None
+        self._http = http_client or httpx.Client(
+            base_url=self.base_url, timeout=timeout, limits=self.limits, headers=headers
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._owns_client:
+            self._http.close()
+
+    def _request(self, method, path, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                response = self._http.request(method, path, headers=self._auth_headers, **kwargs)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+            else:
+                if not self._should_retry(attempt, response):
+                    return self._result(response)
+                time.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    def health(self):
+        return self._request("GET", "/")
+
+    def options(self, refresh=False):
+        """Valid categorical values, cached for options_ttl seconds"""
+        cached = None if refresh else self._cached_options()
+        return cached or self._store_options(self._request("GET", "/api/options"))
+
+    def predict(self, request, explain=False):
+        return self._request("POST", "/api/predict", json=request, params={"explain": explain} if explain else None)
+
+    def predict_many(self, requests, explain=False):
+        """Predict any number of rows; returns the /api/predict/batch response shape"""
+        requests = list(requests)
+        params = {"explain": explain} if explain else None
+
+        def send(chunk):
+            start, rows = chunk
+            return start, self._request("POST", "/api/predict/batch", json=rows, params=params)
+
+        chunks = self._chunks(requests)
+        if len(chunks) <= 1 or self.max_parallel <= 1:
+            return self._merge(len(requests), [send(chunk) for chunk in chunks])
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(chunks))) as pool:
+            return self._merge(len(requests), list(pool.map(send, chunks)))
+
+
+class AsyncSleepDisorderClient(_ClientBase):
+    """asyncio client; batch chunks run concurrently, at most max_parallel at a time"""
+
+    def __init__(self, base_url="http://localhost:8000", timeout=10.0, max_connections=10, max_retries=3,
+                 backoff=0.5, max_backoff=10.0, batch_size=1000, max_parallel=4, options_ttl=300.0,
+                 api_key=None, headers=None, transport=None):
+        super().__init__(base_url, timeout, max_connections, max_retries, backoff, max_backoff,
+                         batch_size, max_parallel, options_ttl, api_key)
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url, timeout=timeout, limits=self.limits, headers=headers, transport=transport
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self._http.aclose()
+
+    async def _request(self, method, path, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                response = await self._http.request(method, path, headers=self._auth_headers, **kwargs)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt))
+            else:
+                if not self._should_retry(attempt, response):
+                    return self._result(response)
+                await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    async def health(self):
+        return await self._request("GET", "/")
+
+    async def options(self, refresh=False):
+        """Valid categorical values, cached for options_ttl seconds"""
+        cached = None if refresh else self._cached_options()
+        return cached or self._store_options(await self._request("GET", "/api/options"))
+
+    async def predict(self, request, explain=False):
+        return await self._request("POST", "/api/predict", json=request, params={"explain": explain} if explain else None)
+
+    async def predict_many(self, requests, explain=False):
+        """Predict any number of rows; returns the /api/predict/batch response shape"""
+        requests = list(requests)
+        params = {"explain": explain} if explain else None
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def send(chunk):
+            start, rows = chunk
+            async with semaphore:
+                return start, await self._request("POST", "/api/predict/batch", json=rows, params=params)
+
+        results = await asyncio.gather(*(send(chunk) for chunk in self._chunks(requests)))
+        return self._merge(len(requests), results)
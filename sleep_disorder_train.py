@@ -0,0 +1,162 @@
+"""
+Train the sleep disorder Decision Tree and save it with its label encoders
+"""
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.isotonic import IsotonicRegression
+from sklearn.preprocessing import LabelEncoder
+from sklearn.model_selection import train_test_split, cross_val_predict, RepeatedStratifiedKFold
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.metrics import accuracy_score, classification_report
+import joblib
+
+DATA_PATH = 'Sleep_health_and_lifestyle_dataset.csv'
+MODEL_PATH = 'sleepdisordermodel.pkl'
+
+
+def load_dataset(path=DATA_PATH):
+    """Load and preprocess the dataset (before encoding)"""
+    df = pd.read_csv(path)
+
+    # Fill missing Sleep Disorder values with None
+    df['Sleep Disorder'] = df['Sleep Disorder'].fillna('None')
+
+    # Drop Person ID
+    df = df.drop('Person ID', axis=1)
+
+    # Split Blood Pressure into SystolicBP and DiastolicBP
+    bp_split = df['Blood Pressure'].str.split('/', expand=True).astype(int)
+    df['SystolicBP'], df['DiastolicBP'] = bp_split[0], bp_split[1]
+    df = df.drop('Blood Pressure', axis=1)
+    return df
+
+
+def fit_confidence_calibration(model, X_train, y_train, folds=5):
+    """
+    Isotonic map from the tree's top-class probability to the observed accuracy
+
+    Fitted on out-of-fold predictions so the leaves are scored on rows they
+    were not grown from. Stored as the breakpoints of the (piecewise linear)
+    map, to be applied with np.interp.
+    """
+    proba = cross_val_predict(clone(model), X_train, y_train, cv=folds, method='predict_proba')
+    confidence = proba.max(axis=1)
+    correct = (model.classes_[proba.argmax(axis=1)] == np.asarray(y_train)).astype(float)
+    isotonic = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds='clip').fit(confidence, correct)
+    return {
+        'method': 'isotonic',
+        'x': isotonic.X_thresholds_.astype(np.float64),
+        'y': isotonic.y_thresholds_.astype(np.float64),
+    }
+
+
+def expected_calibration_error(confidence, correct, bins=15):
+    """Average gap between confidence and accuracy, weighted by bin size"""
+    edges = np.linspace(0, 1, bins + 1)
+    which = np.clip(np.digitize(confidence, edges[1:-1]), 0, bins - 1)
+    error = 0.0
+    for b in range(bins):
+        in_bin = which == b
+        if in_bin.any():
+            error += in_bin.mean() * abs(confidence[in_bin].mean() - correct[in_bin].mean())
+    return error
+
+
+def evaluate_calibration(model, X, y, splits=5, repeats=20, bins=15, random_state=0):
+    """
+    Raw vs calibrated confidence under repeated stratified cross-validation
+
+    A single test split holds too few mistakes to compare calibration on, so
+    every fold refits the tree and its calibration map on the training folds
+    and scores both confidences on the held-out fold. Returns pooled Brier
+    score and ECE, and the share of folds where calibration lowered each.
+    """
+    X, y = np.asarray(X), np.asarray(y)
+    pooled = {"raw": [], "calibrated": [], "correct": []}
+    improved = {"brier": 0, "ece": 0}
+    cv = RepeatedStratifiedKFold(n_splits=splits, n_repeats=repeats, random_state=random_state)
+    for train, test in cv.split(X, y):
+        fold_model = clone(model).fit(X[train], y[train])
+        calibration = fit_confidence_calibration(fold_model, X[train], y[train])
+        proba = fold_model.predict_proba(X[test])
+        raw = proba.max(axis=1)
+        calibrated = np.interp(raw, calibration['x'], calibration['y'])
+        correct = (fold_model.classes_[proba.argmax(axis=1)] == y[test]).astype(float)
+        improved["brier"] += np.mean((calibrated - correct) ** 2) < np.mean((raw - correct) ** 2)
+        improved["ece"] += (expected_calibration_error(calibrated, correct, bins)
+                            < expected_calibration_error(raw, correct, bins))
+        pooled["raw"].append(raw)
+        pooled["calibrated"].append(calibrated)
+        pooled["correct"].append(correct)
+
+    correct = np.concatenate(pooled["correct"])
+    result = {"folds": splits * repeats}
+    for name in ("raw", "calibrated"):
+        confidence = np.concatenate(pooled[name])
+        result[name] = {
+            "brier": float(np.mean((confidence - correct) ** 2)),
+            "ece": float(expected_calibration_error(confidence, correct, bins)),
+        }
+    result["improved"] = {metric: count / result["folds"] for metric, count in improved.items()}
+    return result
+
+
+def train_model(data_path=DATA_PATH, model_path=MODEL_PATH):
+    """Train the model, print evaluation metrics and save the artifact"""
+    # --- Data Load ---
+    df = load_dataset(data_path)
+    print("Dataset shape:", df.shape)
+
+    # --- Encode Categorical Variables ---
+    categorical_cols = ['Gender', 'Occupation', 'BMI Category', 'Sleep Disorder']
+    label_encoders = {}
+    for col in categorical_cols:
+        le = LabelEncoder()
+        df[col] = le.fit_transform(df[col])
+        label_encoders[col] = le
+        print(f"{col} classes: {le.classes_}")
+
+    # --- Train-Test Split ---
+    X = df.drop('Sleep Disorder', axis=1)
+    y = df['Sleep Disorder']
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+    print("Training set size:", X_train.shape)
+    print("Test set size:", X_test.shape)
+
+    # --- Train Decision Tree Model ---
+    model = DecisionTreeClassifier(max_depth=5, min_samples_split=2, min_samples_leaf=2, random_state=42)
+    model.fit(X_train, y_train)
+    print("Model trained successfully!")
+
+    # --- Model Evaluation ---
+    y_pred = model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    print(f"Model Accuracy: {accuracy*100:.2f}%")
+    print("Classification Report:\n", classification_report(y_test, y_pred, target_names=label_encoders['Sleep Disorder'].classes_))
+
+    # --- Confidence Calibration ---
+    calibration = fit_confidence_calibration(model, X_train, y_train)
+    evaluation = evaluate_calibration(model, X, y)
+    for name in ("raw", "calibrated"):
+        print(f"Confidence ({name}, {evaluation['folds']} CV folds): "
+              f"Brier score {evaluation[name]['brier']:.4f}, "
+              f"expected calibration error {evaluation[name]['ece']*100:.2f}%")
+    print(f"Calibration lowered Brier score in {evaluation['improved']['brier']:.0%} of folds "
+          f"and ECE in {evaluation['improved']['ece']:.0%}")
+
+    # --- Save model and encoders ---
+    model_data = {
+        'model': model,
+        'label_encoders': label_encoders,
+        'feature_names': list(X.columns),
+        'calibration': calibration
+    }
+    joblib.dump(model_data, model_path)
+    print(f"Model saved successfully as {model_path}")
+    return model_data
+
+
+if __name__ == "__main__":
+    train_model()
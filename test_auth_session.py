@@ -0,0 +1,191 @@
+"""
+Tests for the Supabase session cache against a local stand-in auth service
+"""
+from types import SimpleNamespace
+
+from auth_session import SessionCache, is_auth_rejection
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class AuthApiError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class FakeAuth:
+    """Mimics the parts of supabase.auth used by SessionCache"""
+
+    def __init__(self, clock, valid_tokens=None, calls=None):
+        self.clock = clock
+        self.calls = calls if calls is not None else {"get_user": 0, "refresh_session": 0, "sign_out": 0}
+        self.valid_tokens = valid_tokens if valid_tokens is not None else {}
+        self.admin = SimpleNamespace(sign_out=self._sign_out)
+        # Like supabase_auth, signing in or refreshing stores the session on the client
+        self.session = None
+        self.closed = False
+        self.error = None
+
+    def spawn(self):
+        """A separate client talking to the same auth service"""
+        client = FakeAuth(self.clock, self.valid_tokens, self.calls)
+        client.error = self.error
+        self.spawned.append(client)
+        return client
+
+    def close(self):
+        self.closed = True
+
+    def issue(self, email, lifetime=3600):
+        n = len(self.valid_tokens) + 1
+        user = SimpleNamespace(email=email)
+        session = SimpleNamespace(
+            access_token=f"access-{n}",
+            refresh_token=f"refresh-{n}",
+            expires_at=self.clock() + lifetime,
+            expires_in=lifetime,
+            user=user,
+        )
+        self.valid_tokens[session.access_token] = user
+        self.valid_tokens[session.refresh_token] = user
+        return session
+
+    def sign_in_with_password(self, credentials):
+        self.session = self.issue(credentials["email"])
+        return SimpleNamespace(session=self.session, user=self.session.user)
+
+    def get_user(self, jwt):
+        self.calls["get_user"] += 1
+        if self.error:
+            raise self.error
+        user = self.valid_tokens.get(jwt)
+        return SimpleNamespace(user=user) if user else None
+
+    def refresh_session(self, refresh_token):
+        self.calls["refresh_session"] += 1
+        if self.error:
+            raise self.error
+        user = self.valid_tokens.get(refresh_token)
+        if user is None:
+            raise AuthApiError("Invalid Refresh Token", 400)
+        self.session = self.issue(user.email)
+        return SimpleNamespace(session=self.session, user=user)
+
+    def _sign_out(self, jwt):
+        self.calls["sign_out"] += 1
+        self.valid_tokens.pop(jwt, None)
+
+
+def _setup():
+    clock = FakeClock()
+    auth = FakeAuth(clock)
+    auth.spawned = []
+    cache = SessionCache(auth, auth.spawn, validate_ttl=300, refresh_margin=60, clock=clock)
+    return clock, auth, cache
+
+
+def test_stored_session_is_validated_without_round_trip():
+    clock, auth, cache = _setup()
+    tokens = cache.store(auth.issue("a@example.com"))
+
+    for _ in range(5):
+        user, tokens = cache.validate(tokens)
+        assert user.email == "a@example.com"
+    assert auth.calls["get_user"] == 0
+
+
+def test_revalidates_after_ttl():
+    clock, auth, cache = _setup()
+    tokens = cache.store(auth.issue("a@example.com"))
+
+    clock.now += 301
+    user, _ = cache.validate(tokens)
+    assert user.email == "a@example.com"
+    assert auth.calls["get_user"] == 1
+
+    cache.validate(tokens)
+    assert auth.calls["get_user"] == 1
+
+
+def test_refreshes_near_expiry():
+    clock, auth, cache = _setup()
+    tokens = cache.store(auth.issue("a@example.com", lifetime=120))
+
+    clock.now += 70
+    user, new_tokens = cache.validate(tokens)
+    assert user.email == "a@example.com"
+    assert auth.calls["refresh_session"] == 1
+    assert new_tokens["access_token"] != tokens["access_token"]
+
+
+def test_sign_out_invalidates():
+    clock, auth, cache = _setup()
+    tokens = cache.store(auth.issue("a@example.com"))
+
+    cache.sign_out(tokens)
+    assert cache.validate(tokens) == (None, None)
+    assert auth.calls["sign_out"] == 1
+
+
+def test_sessions_are_not_shared_between_users():
+    clock, auth, cache = _setup()
+    tokens_a = cache.store(auth.issue("a@example.com"))
+    tokens_b = cache.store(auth.issue("b@example.com"))
+
+    assert cache.validate(tokens_a)[0].email == "a@example.com"
+    assert cache.validate(tokens_b)[0].email == "b@example.com"
+    assert cache.validate(None) == (None, None)
+
+
+def test_shared_client_never_holds_a_session():
+    clock, auth, cache = _setup()
+    user, tokens = cache.sign_in({"email": "a@example.com", "password": "secret"})
+    assert user.email == "a@example.com"
+
+    clock.now += 3600
+    user, tokens = cache.validate(tokens)
+    assert user.email == "a@example.com"
+    assert auth.session is None
+    assert len(auth.spawned) == 2
+    assert all(client.closed for client in auth.spawned)
+
+
+def test_transient_errors_keep_the_cached_user():
+    clock, auth, cache = _setup()
+    tokens = cache.store(auth.issue("a@example.com", lifetime=600))
+
+    auth.error = TimeoutError("timed out")
+    clock.now += 301
+    user, kept = cache.validate(tokens)
+    assert user.email == "a@example.com"
+    assert kept == tokens
+    # Near expiry the refresh fails too, and the user is still kept
+    clock.now += 250
+    assert cache.validate(tokens)[0].email == "a@example.com"
+    assert auth.calls["refresh_session"] == 1
+
+    # Nothing cached for these tokens: unknown rather than signed out
+    other = cache.store(auth.issue("b@example.com"))
+    cache._forget(other["access_token"])
+    assert cache.validate(other) == (None, other)
+
+    # A rejection from the service does sign the user out
+    auth.error = AuthApiError("invalid JWT", 401)
+    clock.now = 1000.0 + 301
+    assert cache.validate(other) == (None, None)
+
+
+def test_is_auth_rejection():
+    assert is_auth_rejection(AuthApiError("bad token", 401))
+    assert is_auth_rejection(AuthApiError("Invalid Refresh Token", 400))
+    assert not is_auth_rejection(AuthApiError("upstream down", 503))
+    assert not is_auth_rejection(AuthApiError("network", 0))
+    assert not is_auth_rejection(AuthApiError("slow down", 429))
+    assert not is_auth_rejection(TimeoutError())
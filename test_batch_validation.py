@@ -0,0 +1,100 @@
+"""
+Tests that vectorized batch validation agrees with PredictionRequest and predict_one
+"""
+import os
+
+import pandas as pd
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+import api
+from inference import REQUEST_FIELDS, UnknownCategoryError
+from workload import WorkloadGenerator
+
+
+def _single_path(service, payload):
+    """Label from the /api/predict path, or None if the request would be rejected"""
+    try:
+        request = api.PredictionRequest(**payload)
+        return service.predict_one(api.request_features(request)).label
+    except (ValidationError, UnknownCategoryError):
+        return None
+
+
+def test_matches_single_request_path(service):
+    frame = WorkloadGenerator(seed=3, unknown_rate=0.2, invalid_rate=0.2).sample(2000).astype(object)
+    # Messier values than the generator produces
+    frame.loc[0, "gender"] = "f"
+    frame.loc[1, "bmi_category"] = "NORMAL WEIGHT"
+    frame.loc[2, "age"] = 30.5
+    frame.loc[3, "heart_rate"] = "fast"
+    frame.loc[4, "daily_steps"] = None
+    frame.loc[5, "occupation"] = 7
+    frame.loc[6, "age"] = "41"
+
+    validated = service.validate_frame(frame)
+    predictions = iter(service.predict_rows(validated.X[validated.valid]))
+    assert 0 < validated.valid.sum() < len(frame)
+    for payload, valid in zip(frame.to_dict("records"), validated.valid.tolist()):
+        expected = _single_path(service, payload)
+        assert (expected is not None) == valid, payload
+        if valid:
+            assert next(predictions).label == expected
+
+
+def test_first_error_per_row(service, example):
+    frame = pd.DataFrame([
+        example,
+        dict(example, age=5, occupation="Astronaut"),
+        dict(example, stress_level=2.5),
+        {k: v for k, v in example.items() if k != "heart_rate"},
+    ])
+    validated = service.validate_frame(frame)
+    assert validated.valid.tolist() == [True, False, False, False]
+    assert validated.errors() == [
+        (1, {"field": "age", "reason": "out_of_range"}),
+        (2, {"field": "stress_level", "reason": "not_an_integer"}),
+        (3, {"field": "heart_rate", "reason": "missing"}),
+    ]
+    assert validated.error_fields() == ["age", "stress_level", "heart_rate"]
+    assert service.feature_dicts(validated.X[:1]) == [
+        {feature: example[field] for field, feature in REQUEST_FIELDS.items()}
+    ]
+
+
+def test_batch_endpoint_reports_errors_compactly(app_client, example):
+    response = app_client.post("/api/predict/batch", json=[
+        example,
+        dict(example, occupation="Astronaut"),
+        dict(example, occupation="Pilot"),
+        dict(example, gender="m", bmi_category="overweight"),
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert [p["success"] for p in body["predictions"]] == [True, False, False, True]
+    assert body["predictions"][1]["error"] == {"field": "occupation", "reason": "unknown_category"}
+    assert list(body["allowed"]) == ["occupation"]
+    assert "Doctor" in body["allowed"]["occupation"]
+
+
+def test_batch_endpoint_reports_empty_rows(app_client):
+    response = app_client.post("/api/predict/batch", json=[{}, {}])
+    body = response.json()
+    assert body["total"] == 2
+    assert body["predictions"] == [
+        {"index": i, "success": False, "error": {"field": "gender", "reason": "missing"}} for i in range(2)
+    ]
+
+
+def test_batch_drift_counts_rejected_categories(api_env, example):
+    api_env.setenv("DRIFT_ENABLED", "true")
+    with TestClient(api.app) as client:
+        client.post("/api/predict/batch", json=[dict(example, occupation="Pilot")] * 10 + [dict(example, gender="m")])
+        stats = client.get("/api/drift").json()
+        # Drift windows are per worker process, and say which one answered
+        assert client.get("/api/metrics").json()["worker_pid"] == stats["worker_pid"] == os.getpid()
+    assert stats["observations"] == 11
+    assert stats["categorical"]["Occupation"]["unknown_rate"] == round(10 / 11, 4)
+    assert stats["categorical"]["Gender"]["unknown_rate"] == 0.0
+    # Numeric features are only observed for rows that passed validation
+    assert stats["numeric"]["Age"]["observations"] == 1
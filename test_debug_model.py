@@ -0,0 +1,26 @@
+"""
+Tests for the model diagnostics CLI exit status
+"""
+import json
+
+import debug_model
+
+
+def test_passes_for_valid_requests(tmp_path, capsys, example):
+    path = tmp_path / "requests.json"
+    path.write_text(json.dumps([example, dict(example, gender="f")]))
+    assert debug_model.main(["--requests", str(path), "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["validation"]["valid"] == 2
+    assert report["tree"]["nodes"] > 0
+
+
+def test_fails_over_invalid_rate(tmp_path, example):
+    path = tmp_path / "requests.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in [example, dict(example, occupation="Astronaut")]))
+    assert debug_model.main(["--requests", str(path)]) == 1
+    assert debug_model.main(["--requests", str(path), "--max-invalid-rate", "0.5"]) == 0
+
+
+def test_fails_for_missing_artifact(tmp_path):
+    assert debug_model.main(["--model", str(tmp_path / "missing.pkl")]) == 1
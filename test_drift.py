@@ -0,0 +1,78 @@
+"""
+Tests for rolling-window drift statistics against hand-computed values
+"""
+import math
+
+import pandas as pd
+import pytest
+
+from drift import NUMERIC_FEATURES, DriftMonitor, bin_edges
+
+
+def _monitor():
+    # Every numeric feature splits at 1.5 into two equally likely bins
+    reference = pd.DataFrame({feature: [1, 1, 2, 2] for feature in NUMERIC_FEATURES})
+    reference["Gender"] = ["Male", "Male", "Female", "Female"]
+    reference["Occupation"] = ["Doctor", "Doctor", "Doctor", "Nurse"]
+    reference["BMI Category"] = ["Normal"] * 4
+    return DriftMonitor(reference, window_seconds=10, num_windows=3)
+
+
+@pytest.fixture
+def monitor():
+    return _monitor()
+
+
+def _inputs(value=1, occupation="Doctor"):
+    inputs = {feature: value for feature in NUMERIC_FEATURES}
+    inputs.update({"Gender": "Male", "Occupation": occupation, "BMI Category": "Normal"})
+    return inputs
+
+
+def test_bin_edges():
+    # Few distinct values: one bin per value, split at the midpoints
+    assert bin_edges([1, 2, 2, 3]) == [1.5, 2.5]
+    # Many distinct values: quantile edges
+    assert bin_edges(range(100), max_bins=4) == [24.75, 49.5, 74.25]
+    assert bin_edges([5, 5, 5]) == []
+
+
+def test_ring_buckets_expire(monitor):
+    monitor.observe(_inputs(), now=0)
+    monitor.observe(_inputs(), now=15)
+    monitor.observe(_inputs(), now=25)
+    assert monitor.stats(now=25)["observations"] == 3
+    # The window covers buckets 1-3 at t=35, so the t=0 observation has aged out
+    assert monitor.stats(now=35)["observations"] == 2
+    # Bucket 3 reuses bucket 0's slot and starts empty
+    monitor.observe(_inputs(), now=30)
+    assert monitor._bucket_ids == [3, 1, 2]
+    assert monitor.stats(now=30)["observations"] == 3
+    assert monitor.stats(now=1000)["observations"] == 0
+
+
+def test_psi_and_ks_match_hand_computation(monitor):
+    for value in (1, 1, 1, 2):
+        monitor.observe(_inputs(value), now=0)
+    stats = monitor.stats(now=0)["numeric"]["Age"]
+    # Expected [0.5, 0.5], observed [0.75, 0.25]
+    psi = 0.25 * math.log(0.75 / 0.5) + (-0.25) * math.log(0.25 / 0.5)
+    assert stats == {"observations": 4, "psi": round(psi, 4), "ks": 0.25}
+
+
+def test_unknown_rate_and_frequency_delta(monitor):
+    for occupation in ("Doctor", "Doctor", "Nurse", "Pilot"):
+        monitor.observe(_inputs(occupation=occupation), now=0)
+    occupation = monitor.stats(now=0)["categorical"]["Occupation"]
+    assert occupation["unknown_rate"] == 0.25
+    assert occupation["frequency_delta"] == {"Doctor": -0.25, "Nurse": 0.0}
+
+
+def test_observe_frame_matches_observe(monitor):
+    rows = [_inputs(1), _inputs(2, "Pilot"), _inputs(3, "Nurse"), dict(_inputs(), Age=None, Gender=None)]
+    monitor.observe_frame(pd.DataFrame(rows), now=0)
+    expected = _monitor()
+    for row in rows:
+        expected.observe(row, now=0)
+    assert monitor.stats(now=0) == expected.stats(now=0)
+    assert monitor.stats(now=0)["categorical"]["Gender"]["unknown_rate"] == 0.25
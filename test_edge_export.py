@@ -0,0 +1,142 @@
+"""
+Parity tests for the edge export and its reference evaluator against model.predict
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from edge_export import EdgeModel, export_model, save_export, threshold_scale
+from sleep_disorder_train import load_dataset
+
+
+@pytest.fixture(scope="module")
+def edge(service, tmp_path_factory):
+    # Round-trip through the file so the test covers what a device would load
+    path = tmp_path_factory.mktemp("edge") / "model.json"
+    save_export(export_model(service), str(path))
+    return EdgeModel.load(str(path))
+
+
+def _requests(frame, edge):
+    return [dict(zip(edge.doc["fields"], row)) for row in frame.itertuples(index=False)]
+
+
+def _assert_parity(service, edge, frame):
+    requests = _requests(frame, edge)
+    encoded = pd.DataFrame([edge.encode(r) for r in requests], columns=service.feature_names)
+    expected = service.label_encoders["Sleep Disorder"].inverse_transform(service.model.predict(encoded))
+    expected_confidence = service.calibrate_confidence(service.model.predict_proba(encoded).max(axis=1)) * 100
+    for request, label, confidence in zip(requests, expected, expected_confidence):
+        assert edge.predict(request) == (label, pytest.approx(confidence, abs=0.005))
+
+
+def test_dataset_parity(service, edge):
+    _assert_parity(service, edge, load_dataset()[service.feature_names])
+
+
+def test_random_request_parity(service, edge):
+    rng = np.random.default_rng(0)
+    n = 5000
+    options = {field: values for field, values in edge.doc["categories"].items()}
+    frame = pd.DataFrame({
+        "gender": rng.choice(options["gender"], n),
+        "age": rng.integers(10, 101, n),
+        "occupation": rng.choice(options["occupation"], n),
+        # Finer than the data's one decimal, e.g. 7.6499 and 7.6501 around the 7.65 split
+        "sleep_duration": rng.integers(0, 120001, n) / 10000,
+        "quality_of_sleep": rng.integers(1, 11, n),
+        "physical_activity_level": rng.integers(1, 121, n),
+        "stress_level": rng.integers(1, 11, n),
+        "bmi_category": rng.choice(options["bmi_category"], n),
+        "heart_rate": rng.integers(40, 151, n),
+        "daily_steps": rng.integers(0, 20001, n),
+        "systolic_bp": rng.integers(90, 201, n),
+        "diastolic_bp": rng.integers(60, 131, n),
+    })
+    frame.loc[:3, "sleep_duration"] = [7.6, 7.6499, 7.65, 7.6501]
+    # Columns in model feature order, named by API field
+    _assert_parity(service, edge, frame[edge.doc["fields"]])
+
+
+def _boundary_requests(service, edge):
+    """
+    Rows that reach every split with the split's feature at the threshold itself and
+    at the decimals either side of the cut point; the other features satisfy the path
+    """
+    ev = service.evaluator
+    doc = edge.doc
+    fields, scales, categories = doc["fields"], doc["scales"], doc["categories"]
+    parent = {}
+    for node, (left, right) in enumerate(zip(ev.children_left, ev.children_right)):
+        if left != -1:
+            parent[int(left)], parent[int(right)] = (node, True), (node, False)
+
+    def cut(node):
+        return doc["threshold"][node] / scales[doc["feature"][node]]
+
+    requests = []
+    for node in range(len(doc["left"])):
+        f = doc["feature"][node]
+        if f == -1:
+            continue
+        # Allowed [low, high) range of each feature on the path to this node
+        low, high = [-np.inf] * len(fields), [np.inf] * len(fields)
+        child = node
+        while child in parent:
+            ancestor, went_left = parent[child]
+            g = doc["feature"][ancestor]
+            if went_left:
+                high[g] = min(high[g], cut(ancestor))
+            else:
+                low[g] = max(low[g], cut(ancestor))
+            child = ancestor
+
+        row = []
+        for g, field in enumerate(fields):
+            step = 1 if field in categories else 1 / scales[g]
+            value = low[g] if low[g] > -np.inf else (high[g] - step if high[g] < np.inf else 0)
+            row.append(int(np.ceil(value)) if field in categories else value)
+        if fields[f] in categories:
+            candidates = [int(np.ceil(cut(node))) - 1, int(np.ceil(cut(node)))]
+        else:
+            candidates = [float(ev.threshold[node]), cut(node), (doc["threshold"][node] - 1) / scales[f]]
+        for value in candidates:
+            if low[f] <= value < high[f]:
+                values = row[:f] + [value] + row[f + 1:]
+                requests.append((node, {
+                    field: categories[field][v] if field in categories else v
+                    for field, v in zip(fields, values)
+                }))
+    return requests
+
+
+def test_split_boundary_parity(service, edge):
+    requests = _boundary_requests(service, edge)
+    encoded = pd.DataFrame([edge.encode(r) for _, r in requests], columns=service.feature_names)
+    path = service.model.decision_path(encoded).toarray()
+    expected = service.model.apply(encoded)
+    for i, (node, request) in enumerate(requests):
+        # Each row really reaches the split it was built for
+        assert path[i, node]
+        assert edge.apply(request) == expected[i], (node, request)
+    # Every split is tested on both sides
+    internal = {node for node, left in enumerate(edge.doc["left"]) if left != -1}
+    sides = {(node, bool(path[i, service.evaluator.children_left[node]])) for i, (node, _) in enumerate(requests)}
+    assert sides == {(node, side) for node in internal for side in (True, False)}
+
+
+def test_export_is_compact_integers(service):
+    document = export_model(service)
+    assert len(json.dumps(document, separators=(",", ":"))) < 4096
+    for key in ("left", "right", "feature", "threshold", "label", "confidence"):
+        assert all(isinstance(v, int) for v in document[key])
+
+
+def test_threshold_scale():
+    assert threshold_scale([40.5, 94.5]) == 10
+    assert threshold_scale([4.0]) == 1
+    # sklearn's threshold between 7.6 and 7.7: the midpoint of their float32 values
+    assert threshold_scale([(float(np.float32(7.6)) + float(np.float32(7.7))) / 2]) == 100
+    assert threshold_scale([]) == 1
@@ -0,0 +1,141 @@
+"""
+Parity tests for the shared inference service against the scikit-learn model
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from inference import (
+    InferenceService, LookupTableEvaluator, TreeEvaluator, UnknownCategoryError
+)
+from sleep_disorder_train import evaluate_calibration, load_dataset
+
+
+def _encoded_dataset(service):
+    df = load_dataset()
+    for col, table in service.encoding_tables.items():
+        df[col] = df[col].map(table)
+    return df[service.feature_names]
+
+
+def _random_rows(service, n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(0, 2, n),            # Gender
+        rng.integers(10, 101, n),         # Age
+        rng.integers(0, 11, n),           # Occupation
+        rng.integers(0, 121, n) / 10,     # Sleep Duration
+        rng.integers(1, 11, n),           # Quality of Sleep
+        rng.integers(1, 121, n),          # Physical Activity Level
+        rng.integers(1, 11, n),           # Stress Level
+        rng.integers(0, 4, n),            # BMI Category
+        rng.integers(40, 151, n),         # Heart Rate
+        rng.integers(0, 20001, n),        # Daily Steps
+        rng.integers(90, 201, n),         # SystolicBP
+        rng.integers(60, 131, n),         # DiastolicBP
+    ]).astype(float)
+    return pd.DataFrame(X, columns=service.feature_names)
+
+
+@pytest.mark.parametrize("rows", ["dataset", "random"])
+def test_batch_matches_sklearn(service, rows):
+    X = _encoded_dataset(service) if rows == "dataset" else _random_rows(service)
+    classes, proba = service.predict_encoded(X.to_numpy())
+
+    np.testing.assert_array_equal(classes, service.model.predict(X))
+    np.testing.assert_allclose(proba, service.model.predict_proba(X))
+
+
+def test_single_row_matches_sklearn(service):
+    X = _random_rows(service, n=500, seed=1)
+    expected = service.model.predict_proba(X)
+    for i, row in enumerate(X.itertuples(index=False)):
+        leaf = service.evaluator.apply_one(list(row))
+        np.testing.assert_allclose(service.evaluator.proba[leaf], expected[i])
+
+
+def test_predict_one(service):
+    inputs = {
+        "Gender": "Male", "Age": 30, "Occupation": "Doctor", "Sleep Duration": 7.5,
+        "Quality of Sleep": 8, "Physical Activity Level": 6, "Stress Level": 5,
+        "BMI Category": "Normal", "Heart Rate": 75, "Daily Steps": 8000,
+        "SystolicBP": 120, "DiastolicBP": 80,
+    }
+    result = service.predict_one(inputs)
+    assert result.label in service.target_labels
+    assert result.raw_confidence == pytest.approx(max(result.probabilities.values()) * 100)
+    assert result.confidence == pytest.approx(service.calibrate_confidence(result.raw_confidence / 100) * 100)
+
+    with pytest.raises(UnknownCategoryError) as excinfo:
+        service.predict_one(dict(inputs, Occupation="Select Occupation"))
+    assert excinfo.value.column == "Occupation"
+
+
+def test_sensitivity_curves_match_point_predictions(service):
+    inputs = {
+        "Gender": "Female", "Age": 45, "Occupation": "Nurse", "Sleep Duration": 5.0,
+        "Quality of Sleep": 4, "Physical Activity Level": 3, "Stress Level": 9,
+        "BMI Category": "Overweight", "Heart Rate": 90, "Daily Steps": 3000,
+        "SystolicBP": 140, "DiastolicBP": 95,
+    }
+    grids = {"Stress Level": range(1, 11), "Sleep Duration": np.linspace(0, 12, 121)}
+    curves = service.sensitivity_curves(inputs, grids)
+
+    for feature, (values, proba) in curves.items():
+        for value, row_proba in zip(values, proba):
+            expected = service.predict_one(dict(inputs, **{feature: value}))
+            np.testing.assert_allclose(row_proba, list(expected.probabilities.values()))
+
+
+def test_explanations_follow_sklearn_decision_path(service):
+    X = _random_rows(service, n=1000, seed=2)
+    predictions = service.predict_rows(X.to_numpy().tolist())
+    node_indicator = service.model.decision_path(X)
+
+    np.testing.assert_array_equal([p.leaf for p in predictions], service.model.apply(X))
+    for i, prediction in enumerate(predictions):
+        explanation = service.explain(prediction)
+        # decision_path includes the leaf itself
+        assert len(explanation.decision_path) == node_indicator[i].nnz - 1
+
+
+def test_compiled_table_matches_sklearn(service):
+    compiled = InferenceService(service.model_data, compile=True)
+    assert isinstance(compiled.evaluator, LookupTableEvaluator)
+
+    X = pd.concat([_encoded_dataset(service), _random_rows(service)], ignore_index=True)
+    # Values exactly on split thresholds must go left, as in scikit-learn
+    X.loc[:99, "Sleep Duration"] = 7.65
+    X.loc[:99, "Physical Activity Level"] = 94.5
+    expected = service.model.apply(X)
+
+    np.testing.assert_array_equal(compiled.evaluator.apply(X.to_numpy()), expected)
+    for i, row in enumerate(X.head(2000).itertuples(index=False)):
+        assert compiled.evaluator.apply_one(list(row)) == expected[i]
+
+
+def test_compiled_table_falls_back_over_budget(service):
+    compiled = InferenceService(service.model_data, compile=True, memory_budget=1024)
+    assert type(compiled.evaluator) is TreeEvaluator
+
+
+def test_calibration_is_monotone_and_optional(service):
+    raw = np.linspace(0, 1, 101)
+    calibrated = service.calibrate_confidence(raw)
+    assert np.all(np.diff(calibrated) >= 0)
+    assert calibrated.min() >= 0 and calibrated.max() <= 1
+
+    # Artifacts trained before calibration report the raw probability
+    legacy = {key: value for key, value in service.model_data.items() if key != 'calibration'}
+    for prediction in InferenceService(legacy).leaf_predictions.values():
+        assert prediction.confidence == prediction.raw_confidence
+
+
+def test_calibration_helps_under_cross_validation(service):
+    df = load_dataset()
+    X = _encoded_dataset(service)
+    y = service.label_encoders['Sleep Disorder'].transform(df['Sleep Disorder'])
+    evaluation = evaluate_calibration(service.model, X, y, repeats=2)
+    assert evaluation["folds"] == 10
+    assert evaluation["calibrated"]["ece"] < evaluation["raw"]["ece"]
+    assert evaluation["calibrated"]["brier"] <= evaluation["raw"]["brier"]
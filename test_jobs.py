@@ -0,0 +1,196 @@
+"""
+Tests for background scoring jobs, including resuming after a worker dies
+"""
+import io
+import sqlite3
+import time
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import api
+from jobs import JobRunner, JobStore, count_rows, score_chunk, COMPLETED
+from usage import Caller
+
+
+def _wait_for(store, job_id, status, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job did not reach {status}: {store.get(job_id)}")
+
+
+def _all_results(store, job_id):
+    results, chunk = [], 0
+    while True:
+        data = store.results(job_id, chunk)
+        if data is None:
+            return results
+        results.extend(data["results"])
+        chunk += 1
+
+
+def test_job_runs_to_completion(tmp_path, service, example):
+    runner = JobRunner(JobStore(str(tmp_path)), lambda: service, chunk_size=100, chunk_pause=0, poll_interval=0.05)
+    runner.start()
+    try:
+        job_id = runner.submit_records([example] * 250 + [dict(example, occupation="Pilot")])
+        job = _wait_for(runner.store, job_id, COMPLETED)
+    finally:
+        runner.stop()
+
+    assert job["processed"] == 251
+    results = _all_results(runner.store, job_id)
+    assert [r["index"] for r in results] == list(range(251))
+    assert results[0]["success"] is True
+    assert results[0]["prediction"] in service.target_labels
+    assert results[-1]["success"] is False
+
+
+def test_job_resumes_after_worker_dies(tmp_path, service, example):
+    store = JobStore(str(tmp_path))
+    submitter = JobRunner(store, lambda: service, chunk_size=100)
+    job_id = submitter.submit_records([example] * 350)
+
+    # A worker claims the job, finishes one chunk, then dies
+    frame = pd.read_csv(store.input_path(job_id), nrows=100)
+    assert store.claim("dead-worker", lease_seconds=60)["id"] == job_id
+    assert store.save_chunk(job_id, "dead-worker", 0, 0, score_chunk(service, frame, 0))
+
+    # Its lease expires and a new worker picks the job up from chunk 1
+    runner = JobRunner(store, lambda: service, chunk_size=100, chunk_pause=0, lease_seconds=0, poll_interval=0.05)
+    runner.start()
+    try:
+        job = _wait_for(store, job_id, COMPLETED)
+    finally:
+        runner.stop()
+
+    assert job["chunks"] == 4
+    assert [r["index"] for r in _all_results(store, job_id)] == list(range(350))
+    # The dead worker can no longer write
+    assert not store.save_chunk(job_id, "dead-worker", 1, 100, [])
+
+
+def test_empty_records_keep_one_row_each(tmp_path, service):
+    store = JobStore(str(tmp_path))
+    job_id = JobRunner(store, lambda: service).submit_records([{}, {}])
+    assert store.get(job_id)["total"] == 2
+    results = score_chunk(service, pd.read_csv(store.input_path(job_id)), 0)
+    assert [r["error"]["reason"] for r in results] == ["missing", "missing"]
+
+
+def test_uploaded_file_total_counts_csv_records(tmp_path, service, example):
+    header = ",".join(example)
+    row = ",".join(str(value) for value in example.values())
+    # A quoted newline inside a field and trailing blank lines are not extra rows
+    broken = row.replace("Doctor", '"Doc\ntor"')
+    upload = io.BytesIO(f"{header}\n{row}\n{broken}\n{row}\n\n\n".encode())
+    assert count_rows(upload) == 3
+
+    runner = JobRunner(JobStore(str(tmp_path)), lambda: service, chunk_pause=0, poll_interval=0.05)
+    runner.start()
+    try:
+        job_id = runner.submit_file(upload, total=count_rows(upload))
+        job = _wait_for(runner.store, job_id, COMPLETED)
+    finally:
+        runner.stop()
+    assert job["total"] == job["processed"] == 3
+    assert [r["success"] for r in _all_results(runner.store, job_id)] == [True, False, True]
+
+
+def test_finished_jobs_expire(tmp_path, service, example):
+    runner = JobRunner(JobStore(str(tmp_path)), lambda: service, chunk_size=100, chunk_pause=0,
+                       poll_interval=0.05, retention_seconds=3600, cleanup_interval=0)
+    old_id = runner.submit_records([example] * 10)
+    queued_id = runner.submit_records([example] * 10)
+    store = runner.store
+    assert store.claim("worker", 60)["id"] == old_id
+    store.save_chunk(old_id, "worker", 0, 0, [])
+    store.finish(old_id, "worker")
+    with store._connect() as conn:
+        conn.execute("UPDATE jobs SET updated = updated - 7200")
+
+    assert runner.cleanup() == 1
+    assert store.get(old_id) is None
+    assert store.results(old_id, 0) is None
+    assert not (tmp_path / "inputs" / f"{old_id}.csv").exists()
+    # Unfinished jobs are kept however old they are
+    assert store.get(queued_id)["status"] == "queued"
+
+
+def test_worker_survives_store_errors(tmp_path, service, example):
+    store = JobStore(str(tmp_path))
+    runner = JobRunner(store, lambda: service, chunk_size=100, chunk_pause=0, poll_interval=0.05)
+    claim, failures = store.claim, []
+
+    def flaky_claim(*args):
+        if not failures:
+            failures.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return claim(*args)
+
+    store.claim = flaky_claim
+    runner.start()
+    try:
+        job_id = runner.submit_records([example] * 10)
+        _wait_for(store, job_id, COMPLETED)
+    finally:
+        runner.stop()
+    assert failures == [1]
+
+
+def test_json_job_endpoint(api_env, example):
+    api_env.setenv("JOBS_ENABLED", "true")
+    with TestClient(api.app) as client:
+        response = client.post("/api/jobs", json=[example] * 3)
+        assert response.status_code == 202
+        assert response.json()["total"] == 3
+        assert client.post("/api/jobs", json={"rows": []}).status_code == 422
+        assert client.post("/api/jobs", content=b"[{", headers={"Content-Type": "application/json"}).status_code == 400
+
+
+def test_store_adds_caller_columns_to_old_stores(tmp_path):
+    with sqlite3.connect(tmp_path / "jobs.sqlite") as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT, chunk_size INTEGER, total INTEGER, "
+            "processed INTEGER, chunks INTEGER, owner TEXT, created REAL, updated REAL, error TEXT)"
+        )
+    store = JobStore(str(tmp_path))
+    store.create("job", 100, total=1, caller=Caller("acme", "10.0.0.1"))
+    assert (store.get("job")["tenant"], store.get("job")["client"]) == ("acme", "10.0.0.1")
+
+
+def test_keyed_jobs_are_billed_quota_limited_and_private(api_env, tmp_path, example):
+    api_env.setenv("JOBS_ENABLED", "true")
+    api_env.setenv("API_KEYS", "acme:secret-1,beta:secret-2")
+    api_env.setenv("USAGE_DB", str(tmp_path / "usage.sqlite"))
+    api_env.setenv("RATE_LIMIT_JOB_ROWS_PER_DAY", "5")
+    acme, beta = {"X-API-Key": "secret-1"}, {"X-API-Key": "secret-2"}
+    with TestClient(api.app) as client:
+        api.job_runner.chunk_pause = 0
+        response = client.post("/api/jobs", json=[example, example, dict(example, occupation="Pilot")], headers=acme)
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        _wait_for(api.job_runner.store, job_id, COMPLETED)
+
+        # Only the submitting tenant can see the job
+        assert client.get(f"/api/jobs/{job_id}", headers=beta).status_code == 404
+        assert client.get(f"/api/jobs/{job_id}/results", headers=beta).status_code == 404
+        assert client.get(f"/api/jobs/{job_id}").status_code == 401
+        assert client.get(f"/api/jobs/{job_id}/results", headers=acme).json()["next_chunk"] is None
+
+        # Rows scored by the worker are billed; the rejected row is not
+        assert client.get("/api/usage", headers=acme).json()["periods"][-1]["rows"] == 2
+
+        # 3 of the 5 daily job rows are used
+        csv = ",".join(example) + "\n" + "\n".join([",".join(str(v) for v in example.values())] * 3) + "\n"
+        response = client.post("/api/jobs/file", files={"file": ("rows.csv", csv)}, headers=acme)
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        assert client.post("/api/jobs", json=[example] * 6, headers=beta).status_code == 413
+        response = client.post("/api/jobs/file", files={"file": ("rows.csv", csv)}, headers=beta)
+        assert response.status_code == 202
+        assert response.json()["total"] == 3
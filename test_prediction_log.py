@@ -0,0 +1,61 @@
+"""
+Tests for the background prediction log (runs locally, no API server needed)
+"""
+import glob
+import os
+import sqlite3
+
+from prediction_log import PredictionLogger
+
+
+def _log_rows(logger, n):
+    for i in range(n):
+        logger.log(
+            endpoint="/api/predict",
+            model_version="test",
+            inputs={"Age": 30 + i},
+            prediction="None",
+            confidence=97.5,
+            latency_ms=1.0
+        )
+
+
+def _read_all(directory):
+    rows = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.sqlite"))):
+        conn = sqlite3.connect(path)
+        rows.extend(conn.execute("SELECT inputs FROM predictions").fetchall())
+        conn.close()
+    return rows
+
+
+def test_records_are_flushed_on_stop(tmp_path):
+    logger = PredictionLogger(directory=str(tmp_path), batch_size=10, flush_interval=0.05)
+    logger.start()
+    _log_rows(logger, 25)
+    logger.stop()
+
+    assert len(_read_all(str(tmp_path))) == 25
+    stats = logger.stats()
+    assert stats["written"] == 25
+    assert stats["dropped"] == 0
+
+
+def test_segments_rotate(tmp_path):
+    logger = PredictionLogger(directory=str(tmp_path), batch_size=4, segment_max_rows=10)
+    logger.start()
+    _log_rows(logger, 25)
+    logger.stop()
+
+    assert len(glob.glob(os.path.join(str(tmp_path), "*.sqlite"))) == 3
+    assert len(_read_all(str(tmp_path))) == 25
+
+
+def test_overflow_is_counted_not_blocking(tmp_path):
+    # Writer not started, so the queue fills up
+    logger = PredictionLogger(directory=str(tmp_path), queue_size=5)
+    _log_rows(logger, 12)
+
+    stats = logger.stats()
+    assert stats["logged"] == 5
+    assert stats["dropped"] == 7
@@ -0,0 +1,57 @@
+"""
+Tests for request tracing (Server-Timing, file export) and the CPU profile endpoint
+"""
+import json
+
+import profiling
+
+
+def _timings(header):
+    return {part.split(";")[0].strip() for part in header.split(",")}
+
+
+def test_server_timing_only_when_requested(app_client, example):
+    response = app_client.post("/api/predict", json=example)
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+
+    response = app_client.post("/api/predict", json=example, headers={"X-Server-Timing": "1"})
+    assert response.status_code == 200
+    assert _timings(response.headers["server-timing"]) == {"queue", "encode", "model", "response", "serialize", "total"}
+
+
+def test_batch_server_timing(app_client, example):
+    response = app_client.post("/api/predict/batch", json=[example, example], headers={"X-Server-Timing": "1"})
+    assert response.status_code == 200
+    assert {"encode", "model", "response", "total"} <= _timings(response.headers["server-timing"])
+
+
+def test_span_is_noop_outside_a_trace():
+    with profiling.span("encode"):
+        pass
+    assert profiling.current_trace() is None
+
+
+def test_file_exporter(tmp_path):
+    exporter = profiling.FileExporter(str(tmp_path / "traces.jsonl"))
+    trace, token = profiling.start_trace("POST /api/predict")
+    with profiling.span("model"):
+        pass
+    profiling.end_trace(trace, token)
+    exporter.export(trace)
+    exporter.close()
+
+    record = json.loads((tmp_path / "traces.jsonl").read_text())
+    assert record["name"] == "POST /api/predict"
+    assert [s["name"] for s in record["spans"]] == ["model"]
+
+
+def test_profile_endpoint_requires_token(app_client, monkeypatch):
+    assert app_client.get("/admin/profile", params={"seconds": 0.1}).status_code == 404
+
+    monkeypatch.setenv("PROFILING_ADMIN_TOKEN", "secret")
+    assert app_client.get("/admin/profile", params={"seconds": 0.1}).status_code == 403
+
+    response = app_client.get("/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert "function calls" in response.text
@@ -0,0 +1,92 @@
+"""
+Tests for the client SDK, against the ASGI app in-process and a mock transport
+"""
+import asyncio
+
+import httpx
+import pytest
+
+import api
+from sleep_client import APIError, AsyncSleepDisorderClient, SleepDisorderClient
+
+
+@pytest.fixture
+def rows(example):
+    rows = [dict(example, age=20 + i) for i in range(10)]
+    rows[7] = dict(example, occupation="Astronaut")
+    return rows
+
+
+@pytest.fixture
+def sdk_client(app_client):
+    with SleepDisorderClient(http_client=app_client, batch_size=3, max_parallel=2) as client:
+        yield client
+
+
+def _check_batch(result, rows):
+    assert result["total"] == len(rows)
+    assert [p["index"] for p in result["predictions"]] == list(range(len(rows)))
+    assert [p["success"] for p in result["predictions"]].count(False) == 1
+    assert result["predictions"][7]["error"]["field"] == "occupation"
+    assert "Doctor" in result["allowed"]["occupation"]
+
+
+def test_sync_client_in_process(sdk_client, rows):
+    assert sdk_client.health()["model_loaded"] is True
+    assert "explanation" in sdk_client.predict(rows[0], explain=True)
+    _check_batch(sdk_client.predict_many(rows), rows)
+
+    with pytest.raises(APIError) as excinfo:
+        sdk_client.predict(rows[7])
+    assert excinfo.value.status_code == 400
+
+
+def test_async_client_in_process(rows):
+    if api.model_data is None:
+        api.load_model_data()
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with AsyncSleepDisorderClient("http://api", transport=transport, batch_size=3) as client:
+            single = await client.predict(rows[0])
+            batch = await client.predict_many(rows)
+            return single, batch
+
+    single, batch = asyncio.run(run())
+    assert single["prediction"] == batch["predictions"][0]["result"]["prediction"]
+    _check_batch(batch, rows)
+
+
+def test_retries_honour_retry_after_and_options_are_cached(example):
+    calls = {"predict": 0, "options": 0}
+
+    def handler(request):
+        if request.url.path == "/api/options":
+            calls["options"] += 1
+            return httpx.Response(200, json={"occupation": ["Doctor"]})
+        calls["predict"] += 1
+        if calls["predict"] < 3:
+            return httpx.Response(503 if calls["predict"] == 1 else 429, headers={"Retry-After": "0"}, json={"detail": "busy"})
+        return httpx.Response(200, json={"prediction": "None"})
+
+    http_client = httpx.Client(base_url="http://api", transport=httpx.MockTransport(handler))
+    client = SleepDisorderClient(http_client=http_client, max_retries=3)
+    assert client.predict(example) == {"prediction": "None"}
+    assert calls["predict"] == 3
+
+    client.options()
+    client.options()
+    assert calls["options"] == 1
+    client.options(refresh=True)
+    assert calls["options"] == 2
+
+
+def test_gives_up_after_max_retries(example):
+    def handler(request):
+        return httpx.Response(429, headers={"Retry-After": "0"}, json={"detail": "Too many single requests queued"})
+
+    http_client = httpx.Client(base_url="http://api", transport=httpx.MockTransport(handler))
+    client = SleepDisorderClient(http_client=http_client, max_retries=2)
+    with pytest.raises(APIError) as excinfo:
+        client.predict(example)
+    assert excinfo.value.status_code == 429
@@ -0,0 +1,144 @@
+"""
+Tests for per-API-key rate limits and usage accounting
+"""
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from sleep_client import APIError, SleepDisorderClient
+from usage import Caller, CountMinSketch, TokenBucket, UsageStore, UsageTracker, parse_api_keys, sketch_key
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_continuously():
+    bucket = TokenBucket(60, now=0.0)
+    assert bucket.take(60, now=0.0) == 0
+    assert bucket.take(1, now=0.0) == pytest.approx(1.0)
+    # One token per second at 60 per minute
+    assert bucket.take(1, now=1.0) == 0
+    assert bucket.take(30, now=11.0) == pytest.approx(20.0)
+    assert bucket.take(10, now=1000.0) == 0
+    assert bucket.tokens == 50
+
+
+def test_count_min_sketch_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4)
+    true_counts = {f"client-{i}": i + 1 for i in range(500)}
+    for key, count in true_counts.items():
+        sketch.add(key, count)
+    for key, count in true_counts.items():
+        assert sketch.estimate(key) >= count
+    assert sketch.estimate("never-seen") >= 0
+
+
+def test_parse_api_keys():
+    assert parse_api_keys(" acme:k1, acme:k2,beta:k3 ,") == {"k1": "acme", "k2": "acme", "k3": "beta"}
+    with pytest.raises(ValueError):
+        parse_api_keys("no-separator")
+
+
+def test_tracker_flushes_and_reports(tmp_path):
+    clock, wall = Clock(), Clock(7200.0)
+    tracker = UsageTracker(
+        {"k1": "acme", "k2": "beta"}, UsageStore(str(tmp_path / "usage.sqlite")),
+        requests_per_minute=2, rows_per_minute=100, clock=clock, wall_clock=wall,
+    )
+    acme, beta = Caller("acme", "10.0.0.1"), Caller("beta", "10.0.0.2")
+
+    assert tracker.admit_request(acme) == 0
+    assert tracker.admit_request(acme) == 0
+    assert tracker.admit_request(acme) > 0
+    assert tracker.admit_request(beta) == 0
+    assert tracker.admit_rows(acme, 80) == 0
+    assert tracker.admit_rows(acme, 30) > 0
+    assert tracker.admit_rows(acme, 101) == float("inf")
+    tracker.record_rows(acme, 80)
+    tracker.flush()
+
+    # Pending counts in the next period are combined with the stored ones
+    wall.now += 3600
+    clock.now += 60
+    assert tracker.admit_request(acme) == 0
+    tracker.record_rows(acme, 5)
+
+    usage = tracker.usage("acme", client="10.0.0.1")
+    assert [p["period_start"] for p in usage["periods"]] == [7200, 10800]
+    first, second = usage["periods"]
+    assert (first["requests"], first["rows"], first["rejected_requests"], first["rejected_rows"]) == (2, 80, 1, 30)
+    assert (second["requests"], second["rows"]) == (1, 5)
+    assert usage["client"]["rows_this_period"] == 5
+
+    tracker.flush()
+    # A second flush adds to the stored period rather than replacing it
+    tracker.record_rows(acme, 2)
+    tracker.flush()
+    assert tracker.usage("acme", client="10.0.0.1")["client"]["rows_this_period"] == 7
+    assert tracker.usage("beta")["periods"][0]["requests"] == 1
+
+
+def test_failed_flush_keeps_usage(tmp_path):
+    wall = Clock(7200.0)
+    store = UsageStore(str(tmp_path / "usage.sqlite"))
+    tracker = UsageTracker({"k1": "acme"}, store, clock=Clock(), wall_clock=wall)
+    acme = Caller("acme", "10.0.0.1")
+    tracker.admit_request(acme)
+    tracker.record_rows(acme, 10)
+
+    add = store.add
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    store.add = locked
+    with pytest.raises(sqlite3.OperationalError):
+        tracker.flush()
+    # Counted while the write was failing
+    tracker.record_rows(acme, 5)
+
+    store.add = add
+    tracker.flush()
+    assert store.totals("acme", 0) == [(7200, 1, 15, 0, 0)]
+    assert store.sketch(7200).estimate(sketch_key("acme", "10.0.0.1")) >= 15
+
+
+@pytest.fixture
+def keyed_app(api_env, tmp_path):
+    api_env.setenv("API_KEYS", "acme:secret-1")
+    api_env.setenv("USAGE_DB", str(tmp_path / "usage.sqlite"))
+    api_env.setenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "4")
+    api_env.setenv("RATE_LIMIT_ROWS_PER_MINUTE", "4")
+    with TestClient(api.app) as test_client:
+        yield test_client
+
+
+def test_api_requires_key_and_enforces_limits(keyed_app, example):
+    assert keyed_app.post("/api/predict", json=example).status_code == 401
+    assert keyed_app.post("/api/predict", json=example, headers={"X-API-Key": "wrong"}).status_code == 401
+
+    with SleepDisorderClient(http_client=keyed_app, api_key="secret-1", max_retries=0) as client:
+        assert client.predict(example)["prediction"] == "None"
+        with pytest.raises(APIError) as excinfo:
+            client.predict_many([example] * 5)
+        assert excinfo.value.status_code == 413
+        assert client.predict_many([example] * 3)["total"] == 3
+
+        usage = client._request("GET", "/api/usage")
+        assert usage["tenant"] == "acme"
+        assert usage["periods"][-1]["rows"] == 4
+
+        with pytest.raises(APIError) as excinfo:
+            client.predict(example)
+        assert excinfo.value.status_code == 429
+
+    response = keyed_app.post("/api/predict", json=example, headers={"X-API-Key": "secret-1"})
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
@@ -0,0 +1,54 @@
+"""
+Tests for the synthetic workload generator
+"""
+import io
+
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+from api import PredictionRequest
+from inference import FIELD_RANGES, REQUEST_FIELDS
+from workload import UNKNOWN_VALUE, WorkloadGenerator
+
+
+def test_same_seed_same_rows():
+    first = WorkloadGenerator(seed=5, unknown_rate=0.1, invalid_rate=0.1).sample(1000)
+    second = WorkloadGenerator(seed=5, unknown_rate=0.1, invalid_rate=0.1).sample(1000)
+    pd.testing.assert_frame_equal(first, second)
+    assert not first.equals(WorkloadGenerator(seed=6).sample(1000))
+
+
+def test_rows_are_valid_requests():
+    frame = WorkloadGenerator(seed=0).sample(20000)
+    assert list(frame.columns) == list(REQUEST_FIELDS)
+    for field, (low, high) in FIELD_RANGES.items():
+        assert frame[field].between(low, high).all(), field
+    assert (frame["systolic_bp"] > frame["diastolic_bp"]).all()
+    assert UNKNOWN_VALUE not in set(frame["occupation"])
+    for payload in frame.head(200).to_dict("records"):
+        PredictionRequest(**payload)
+
+
+def test_error_rates():
+    n = 50000
+    frame = WorkloadGenerator(seed=1, unknown_rate=0.05, invalid_rate=0.02).sample(n)
+    unknown = (frame[["gender", "occupation", "bmi_category"]] == UNKNOWN_VALUE).any(axis=1)
+    invalid = pd.concat(
+        [~frame[field].between(low, high) for field, (low, high) in FIELD_RANGES.items()], axis=1
+    ).any(axis=1)
+    assert unknown.mean() == pytest.approx(0.05, abs=0.005)
+    assert invalid.mean() == pytest.approx(0.02, abs=0.005)
+
+    payload = frame[invalid].iloc[0].to_dict()
+    with pytest.raises(ValidationError):
+        PredictionRequest(**payload)
+
+
+def test_csv_stream_in_chunks():
+    output = io.StringIO()
+    WorkloadGenerator(seed=2).write_csv(output, total=2500, chunk_size=1000)
+    output.seek(0)
+    frame = pd.read_csv(output)
+    assert len(frame) == 2500
+    assert list(frame.columns) == list(REQUEST_FIELDS)
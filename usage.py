@@ -0,0 +1,318 @@
+"""
+Per-API-key rate limiting and usage accounting with bounded memory.
+
+Callers identify themselves with an ``X-API-Key`` header; each key belongs to
+a tenant (partner app). Every tenant has token buckets for requests and for
+batch rows, which refill continuously and so behave like a sliding one-minute
+window, plus a daily bucket for rows submitted as background jobs. Usage is
+counted in memory (exact totals per tenant, plus a count-min sketch of rows
+per tenant and client address, whose size does not grow with the number of
+clients) and a background thread adds it to a local SQLite file every few
+seconds, so no request waits on storage. If a write fails, the counts stay
+in memory and go out with the next flush.
+
+Limits are enforced per process: under gunicorn each worker gets the full
+allowance, so divide the deployment's limits by WEB_CONCURRENCY.
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+
+Caller = namedtuple('Caller', ['tenant', 'client'])
+
+
+class TokenBucket:
+    """Allows ``capacity`` units per ``period`` seconds (a minute by default), refilled continuously"""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, now, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = now
+
+    def take(self, cost, now):
+        """Take ``cost`` tokens; returns 0 on success, else seconds until they are available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if cost <= self.tokens:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class CountMinSketch:
+    """Fixed-size frequency table; estimates never undercount and sketches can be added together"""
+
+    def __init__(self, width=2048, depth=4, counts=None):
+        self.width = width
+        self.depth = depth
+        self.counts = np.zeros((depth, width), dtype=np.int64) if counts is None else counts
+
+    def _columns(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[8 * i:8 * i + 8], 'little') % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        for row, column in enumerate(self._columns(key)):
+            self.counts[row, column] += count
+
+    def estimate(self, key):
+        return int(min(self.counts[row, column] for row, column in enumerate(self._columns(key))))
+
+
+def sketch_key(tenant, client):
+    return f"{tenant}\x00{client}"
+
+
+class UsageStore:
+    """Usage totals and sketches per period in a local SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                "tenant TEXT, period INTEGER, requests INTEGER, rows INTEGER, "
+                "rejected_requests INTEGER, rejected_rows INTEGER, PRIMARY KEY (tenant, period))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sketches ("
+                "period INTEGER PRIMARY KEY, depth INTEGER, width INTEGER, counts BLOB)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, totals, sketches):
+        """Add in-memory deltas: {(tenant, period): [4 counters]} and {period: CountMinSketch}"""
+        with self._connect() as conn:
+            # Serialize read-modify-write of the sketches across worker processes
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (tenant, period) DO UPDATE SET "
+                "requests = requests + excluded.requests, rows = rows + excluded.rows, "
+                "rejected_requests = rejected_requests + excluded.rejected_requests, "
+                "rejected_rows = rejected_rows + excluded.rejected_rows",
+                [(tenant, period, *counters) for (tenant, period), counters in totals.items()],
+            )
+            for period, sketch in sketches.items():
+                row = conn.execute("SELECT depth, width, counts FROM sketches WHERE period = ?", (period,)).fetchone()
+                counts = sketch.counts
+                if row is not None and (row[0], row[1]) == (sketch.depth, sketch.width):
+                    counts = counts + np.frombuffer(row[2], dtype=np.int64).reshape(sketch.depth, sketch.width)
+                conn.execute(
+                    "INSERT OR REPLACE INTO sketches VALUES (?, ?, ?, ?)",
+                    (period, sketch.depth, sketch.width, counts.tobytes()),
+                )
+
+    def totals(self, tenant, since):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT period, requests, rows, rejected_requests, rejected_rows FROM usage "
+                "WHERE tenant = ? AND period >= ? ORDER BY period",
+                (tenant, since),
+            ).fetchall()
+
+    def sketch(self, period):
+        with self._connect() as conn:
+            row = conn.execute("SELECT depth, width, counts FROM sketches WHERE period = ?", (period,)).fetchone()
+        if row is None:
+            return None
+        depth, width, blob = row
+        return CountMinSketch(width, depth, np.frombuffer(blob, dtype=np.int64).reshape(depth, width).copy())
+
+
+class UsageTracker:
+    """Authenticates API keys, applies per-tenant limits and accumulates usage for the store"""
+
+    def __init__(self, keys, store, requests_per_minute=600, rows_per_minute=60000, job_rows_per_day=10000000,
+                 period_seconds=3600, flush_interval=10.0, sketch_width=2048, sketch_depth=4,
+                 clock=time.monotonic, wall_clock=time.time):
+        self.keys = keys
+        self.store = store
+        self.requests_per_minute = requests_per_minute
+        self.rows_per_minute = rows_per_minute
+        self.job_rows_per_day = job_rows_per_day
+        self.period_seconds = period_seconds
+        self.flush_interval = flush_interval
+        self.sketch_width = sketch_width
+        self.sketch_depth = sketch_depth
+        self.clock = clock
+        self.wall_clock = wall_clock
+
+        now = clock()
+        tenants = set(keys.values())
+        self._request_buckets = {tenant: TokenBucket(requests_per_minute, now) for tenant in tenants}
+        self._row_buckets = {tenant: TokenBucket(rows_per_minute, now) for tenant in tenants}
+        self._job_row_buckets = {tenant: TokenBucket(job_rows_per_day, now, period=86400.0) for tenant in tenants}
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._sketches = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def tenant_for(self, api_key):
+        return self.keys.get(api_key) if api_key else None
+
+    def _period(self):
+        return int(self.wall_clock() // self.period_seconds) * self.period_seconds
+
+    def _counters(self, tenant):
+        # Caller holds self._lock
+        key = (tenant, self._period())
+        counters = self._totals.get(key)
+        if counters is None:
+            counters = self._totals[key] = [0, 0, 0, 0]
+        return counters
+
+    def admit_request(self, caller):
+        """Count one request; returns 0 if admitted, else seconds to wait"""
+        wait = self._request_buckets[caller.tenant].take(1, self.clock())
+        with self._lock:
+            self._counters(caller.tenant)[2 if wait else 0] += 1
+        return wait
+
+    def _admit_rows(self, buckets, limit, caller, rows):
+        if rows > limit:
+            return math.inf
+        wait = buckets[caller.tenant].take(rows, self.clock())
+        if wait:
+            with self._lock:
+                self._counters(caller.tenant)[3] += rows
+        return wait
+
+    def admit_rows(self, caller, rows):
+        """Reserve ``rows`` from the tenant's row allowance; returns 0 if admitted, else seconds to wait"""
+        return self._admit_rows(self._row_buckets, self.rows_per_minute, caller, rows)
+
+    def admit_job_rows(self, caller, rows):
+        """Reserve a job's ``rows`` from the tenant's daily job allowance; returns 0 if admitted, else seconds to wait"""
+        return self._admit_rows(self._job_row_buckets, self.job_rows_per_day, caller, rows)
+
+    def record_rows(self, caller, rows):
+        """Bill rows scored for a caller; thread-safe, so job workers can call it"""
+        with self._lock:
+            self._counters(caller.tenant)[1] += rows
+            period = self._period()
+            sketch = self._sketches.get(period)
+            if sketch is None:
+                sketch = self._sketches[period] = CountMinSketch(self.sketch_width, self.sketch_depth)
+            sketch.add(sketch_key(caller.tenant, caller.client), rows)
+
+    def flush(self):
+        """Add pending usage to the store; if that fails it stays pending for the next flush"""
+        with self._lock:
+            totals, self._totals = self._totals, {}
+            sketches, self._sketches = self._sketches, {}
+        if not (totals or sketches):
+            return
+        try:
+            self.store.add(totals, sketches)
+        except Exception:
+            # store.add is one transaction, so nothing was written: merge the deltas
+            # back with whatever was counted meanwhile
+            with self._lock:
+                for key, counters in totals.items():
+                    pending = self._totals.get(key, [0, 0, 0, 0])
+                    self._totals[key] = [a + b for a, b in zip(pending, counters)]
+                for period, sketch in sketches.items():
+                    pending = self._sketches.get(period)
+                    if pending is not None:
+                        sketch.counts += pending.counts
+                    self._sketches[period] = sketch
+            raise
+
+    def usage(self, tenant, periods=24, client=None):
+        """Per-period totals for a tenant, flushed and pending, plus an estimate for one client"""
+        current = self._period()
+        since = current - (periods - 1) * self.period_seconds
+        by_period = {row[0]: list(row[1:]) for row in self.store.totals(tenant, since)}
+        with self._lock:
+            for (pending_tenant, period), counters in self._totals.items():
+                if pending_tenant == tenant and period >= since:
+                    stored = by_period.setdefault(period, [0, 0, 0, 0])
+                    by_period[period] = [a + b for a, b in zip(stored, counters)]
+            pending_sketch = self._sketches.get(current)
+            pending_client = pending_sketch.estimate(sketch_key(tenant, client)) if pending_sketch and client else 0
+        result = {
+            "tenant": tenant,
+            "period_seconds": self.period_seconds,
+            "limits": {
+                "requests_per_minute": self.requests_per_minute,
+                "rows_per_minute": self.rows_per_minute,
+                "job_rows_per_day": self.job_rows_per_day,
+            },
+            "periods": [
+                dict(zip(["period_start", "requests", "rows", "rejected_requests", "rejected_rows"], [period] + counters))
+                for period, counters in sorted(by_period.items())
+            ],
+        }
+        if client:
+            stored_sketch = self.store.sketch(current)
+            stored_client = stored_sketch.estimate(sketch_key(tenant, client)) if stored_sketch else 0
+            result["client"] = {"client": client, "rows_this_period": stored_client + pending_client}
+        return result
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="usage-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Error flushing usage: {str(e)}")
+
+
+def parse_api_keys(value):
+    """Parse API_KEYS, a comma-separated list of tenant:key pairs"""
+    keys = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        tenant, sep, key = entry.partition(":")
+        if not sep or not tenant or not key:
+            raise ValueError(f"API_KEYS entries must look like tenant:key, got {entry!r}")
+        keys[key] = tenant
+    return keys
+
+
+def tracker_from_env():
+    """Build a UsageTracker from API_KEYS and USAGE_* settings, or None if no keys are configured"""
+    keys = parse_api_keys(os.getenv("API_KEYS", ""))
+    if not keys:
+        return None
+    return UsageTracker(
+        keys,
+        UsageStore(os.getenv("USAGE_DB", "usage.sqlite")),
+        requests_per_minute=int(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "600")),
+        rows_per_minute=int(os.getenv("RATE_LIMIT_ROWS_PER_MINUTE", "60000")),
+        job_rows_per_day=int(os.getenv("RATE_LIMIT_JOB_ROWS_PER_DAY", "10000000")),
+        period_seconds=int(os.getenv("USAGE_PERIOD_SECONDS", "3600")),
+        flush_interval=float(os.getenv("USAGE_FLUSH_SECONDS", "10")),
+    )
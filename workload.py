@@ -0,0 +1,152 @@
+"""
+Synthetic request workloads calibrated on the sleep dataset, for benchmarks and load tests.
+
+    python workload.py --rows 10000000 --seed 7 --output requests.csv
+    python workload.py --rows 1000 --format jsonl --unknown-rate 0.05 | ...
+
+Rows are drawn by resampling dataset rows, which keeps the joint
+distribution (categorical frequencies, correlated lifestyle features and
+systolic/diastolic pairs), then jittering the continuous fields and clipping
+them to the ranges /api/predict accepts. Physical Activity Level is recorded
+as 30-120 in the dataset but the API takes 1-10, so valid rows clip it to 10.
+
+A fraction of rows can be made to fail validation on purpose: ``unknown_rate``
+replaces one categorical field with a value the model does not know, and
+``invalid_rate`` puts one numeric field above its allowed maximum.
+
+Sampling is vectorized per chunk, so generation runs at millions of rows per
+second; the output is the same for the same seed and chunk size.
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from inference import FIELD_RANGES, INTEGER_FIELDS, REQUEST_FIELDS
+from sleep_disorder_train import DATA_PATH, load_dataset
+
+CATEGORICAL_FIELDS = ["gender", "occupation", "bmi_category"]
+
+# Standard deviation of the noise added to each resampled value
+JITTER = {
+    "age": 2.0,
+    "sleep_duration": 0.2,
+    "heart_rate": 2.0,
+    "daily_steps": 400.0,
+    "systolic_bp": 3.0,
+}
+
+UNKNOWN_VALUE = "Unknown"
+
+
+class WorkloadGenerator:
+    """Seeded, vectorized sampler of /api/predict request rows"""
+
+    def __init__(self, data_path=DATA_PATH, seed=0, unknown_rate=0.0, invalid_rate=0.0, jitter=True):
+        df = load_dataset(data_path)
+        self.rng = np.random.default_rng(seed)
+        self.unknown_rate = unknown_rate
+        self.invalid_rate = invalid_rate
+        self.jitter = jitter
+        self.size = len(df)
+
+        # Categorical columns as integer codes; the last category is reserved for unknowns
+        self.categories = {}
+        self.codes = {}
+        for field in CATEGORICAL_FIELDS:
+            values = df[REQUEST_FIELDS[field]]
+            categories = sorted(values.unique().tolist())
+            self.categories[field] = categories + [UNKNOWN_VALUE]
+            self.codes[field] = pd.Categorical(values, categories=categories).codes.astype(np.int16)
+        self.numeric = {
+            field: df[REQUEST_FIELDS[field]].to_numpy(dtype=np.float64) for field in FIELD_RANGES
+        }
+
+    def sample(self, n):
+        """One DataFrame of n request rows, columns named and ordered like /api/predict"""
+        rng = self.rng
+        idx = rng.integers(0, self.size, n)
+        columns = {field: codes[idx] for field, codes in self.codes.items()}
+        numeric = {field: values[idx] for field, values in self.numeric.items()}
+
+        if self.jitter:
+            for field, scale in JITTER.items():
+                numeric[field] = numeric[field] + rng.normal(0.0, scale, n)
+            # Move diastolic with systolic so the pair stays plausible
+            shift = numeric["systolic_bp"] - self.numeric["systolic_bp"][idx]
+            numeric["diastolic_bp"] = numeric["diastolic_bp"] + 0.6 * shift + rng.normal(0.0, 1.0, n)
+
+        for field, (low, high) in FIELD_RANGES.items():
+            values = np.clip(numeric[field], low, high)
+            numeric[field] = np.rint(values).astype(np.int64) if field in INTEGER_FIELDS else np.round(values, 1)
+
+        if self.unknown_rate > 0:
+            rows = np.flatnonzero(rng.random(n) < self.unknown_rate)
+            which = rng.integers(0, len(CATEGORICAL_FIELDS), len(rows))
+            for i, field in enumerate(CATEGORICAL_FIELDS):
+                columns[field][rows[which == i]] = len(self.categories[field]) - 1
+
+        if self.invalid_rate > 0:
+            fields = list(FIELD_RANGES)
+            rows = np.flatnonzero(rng.random(n) < self.invalid_rate)
+            which = rng.integers(0, len(fields), len(rows))
+            for i, field in enumerate(fields):
+                target = rows[which == i]
+                low, high = FIELD_RANGES[field]
+                numeric[field][target] = high + rng.integers(1, max(high - low, 1) + 1, len(target))
+
+        data = {}
+        for field in REQUEST_FIELDS:
+            if field in self.codes:
+                data[field] = pd.Categorical.from_codes(columns[field], self.categories[field])
+            else:
+                data[field] = numeric[field]
+        return pd.DataFrame(data)
+
+    def chunks(self, total, chunk_size=100000):
+        """Yield DataFrames until total rows have been produced"""
+        remaining = total
+        while remaining > 0:
+            n = min(chunk_size, remaining)
+            yield self.sample(n)
+            remaining -= n
+
+    def payloads(self, total, chunk_size=100000):
+        """Yield request dicts, ready to send as /api/predict bodies"""
+        for frame in self.chunks(total, chunk_size):
+            yield from frame.to_dict("records")
+
+    def write_csv(self, output, total, chunk_size=100000):
+        """Write total rows as CSV with a header of request field names"""
+        for i, frame in enumerate(self.chunks(total, chunk_size)):
+            frame.to_csv(output, header=(i == 0), index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic sleep disorder prediction requests")
+    parser.add_argument("--rows", type=int, default=1000, help="number of rows to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--output", default="-", help="output file, or - for stdout")
+    parser.add_argument("--unknown-rate", type=float, default=0.0, help="fraction of rows with an unknown category")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="fraction of rows with an out-of-range value")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--data", default=DATA_PATH, help="dataset to calibrate on")
+    args = parser.parse_args(argv)
+
+    generator = WorkloadGenerator(args.data, args.seed, args.unknown_rate, args.invalid_rate)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        if args.format == "csv":
+            generator.write_csv(output, args.rows, args.chunk_size)
+        else:
+            for frame in generator.chunks(args.rows, args.chunk_size):
+                output.write(frame.to_json(orient="records", lines=True))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()